@@ -1,15 +1,16 @@
-import os
 import json
 import requests
 import pandas as pd
 import geopandas as gpd
-import multiprocessing as mp
 
 from os import listdir
 from datetime import date
 from vincenty import vincenty
 from numpy.core.numeric import full
 
+from fetcher import fetch_measurements
+from measurements import parse_measurements
+
 EU_LIST = ['Germany', 'United Kingdom', 'France', 'Italy', 'Ukraine', 'Poland', 'Netherlands', 'Belgium', 'Spain', 'Romania', 'Austria', 'Hungary', 'Slovakia', 'Czech Republic', 'Switzerland']    
 
 def get_locations(mixnode_data, cities):
@@ -140,46 +141,6 @@ def parse_ip_addresses():
 
     return ip_list
 
-def manage_processes(ip_list):
-    num_processes = 64
-    ip_addresses = list(ip_list.keys())
-
-    portion_size = int(len(ip_addresses) / num_processes)
-
-    index_start = 0
-    index_end = portion_size
-    processes = []
-    for i in range(0, num_processes):
-        ips = ip_addresses[index_start:index_end]
-        ip_subset = {x: ip_list[x] for x in ips}
-
-        processes.append(mp.Process(target=fetch_subset_measurements, args=(ip_subset, )))
-        # print ('Process {} added with {} ips in total'.format(i, len(ip_subset)))
-
-        index_start = index_end
-        index_end = index_end + portion_size
-
-    for p in processes:
-        p.start()
-    
-    for p in processes:
-        p.join()
-
-    timing_files = [f for f in listdir('measurements/')]
-    node_ids = [int(x.split('_')[0]) for x in timing_files]
-
-def fetch_subset_measurements(ip_subset):
-    for node in ip_subset:
-        ip = ip_subset[node]
-        try:
-            r = requests.get('http://{}:8000/verloc'.format(ip), timeout=5)
-            data = r.json()
-
-            with open('measurements/{}_timings.json'.format(node), 'w') as outfile:
-                json.dump(data, outfile)
-        except:
-            pass
-
 def filter_node_identities(mixnodes, out_file):
     timing_files = [f for f in listdir('measurements/')]
     node_ids = [int(x.split('_')[0]) for x in timing_files]
@@ -191,94 +152,6 @@ def filter_node_identities(mixnodes, out_file):
 
     return mixnodes
 
-def manage_measurement_parser(node_identities):
-    files = []
-    for file in os.listdir('measurements/'):
-        filename = os.fsdecode(file)
-        if filename.endswith('.json'):
-            files.append(filename)
-
-    num_processes = 64
-
-    portion_size = int(len(files) / num_processes)
-
-    index_start = 0
-    index_end = portion_size
-    processes = []
-    for i in range(0, num_processes):
-        file_subset = files[index_start:index_end]
-
-        processes.append(mp.Process(target=read_measurements, args=(file_subset, node_identities, i)))
-        print ('Process {} added with {} nodes in total'.format(i, len(file_subset)))
-
-        index_start = index_end
-        index_end = index_end + portion_size
-
-    for p in processes:
-        p.start()
-    
-    for p in processes:
-        p.join()
-            
-def read_measurements(measurement_subset, node_identities, process_id):
-
-    propagation = {'FromIndex': [], 'ToIndex': [], 'TimeFromTo': []}
-
-    for file in measurement_subset:
-        from_id = file.split('_')[0]
-        
-        full_path = 'measurements/{}'.format(file)
-        timings = pd.read_json(full_path)
-
-        try:
-            from_indices, to_indices, time_from_to = format_timings(timings, from_id, node_identities)
-
-            propagation['FromIndex'].extend(from_indices)
-            propagation['ToIndex'].extend(to_indices)
-            propagation['TimeFromTo'].extend(time_from_to)
-        except:
-            pass
-
-    if len(propagation['FromIndex']) > 1:
-        prop_dict = pd.DataFrame.from_dict(propagation)
-        prop_dict.to_csv('mp/{}_propagation.csv'.format(process_id), index=False, sep=',')
-
-def format_timings(timings, from_index, node_identities):
-    timings = pd.concat([timings.drop(['latest_measurement'], axis=1), timings['latest_measurement'].apply(pd.Series)], axis=1)
-    timings = timings.dropna()
-
-    timings.reset_index(drop=True, inplace=True)
-
-    id_key_dict = node_identities[['identity_key', 'id']].set_index('identity_key').T.to_dict('list')
-    s = timings['identity'].map(id_key_dict)
-
-    timings['id'] = s.explode()
-    timings.dropna()
-
-    timings['minimum'] = timings['minimum'].apply(time_formatter)
-
-    to_indices = list(timings['id'])
-    time_from_to = list(timings['minimum'])
-    from_indices = [from_index] * len(to_indices)
-    
-    return from_indices, to_indices, time_from_to
-
-def time_formatter(time_string):
-    timing = time_string.split(' ')
-    seconds = 0
-    for t in timing:
-        if t.endswith('ms'):
-            ms = t.split('ms')[0]
-            seconds = seconds + int(ms) / 1000
-        elif t.endswith('us'):
-            us = t.split('us')[0]
-            seconds = seconds + int(us) / 1e+6
-        elif t.endswith('ns'):
-            ns = t.split('ns')[0]
-            seconds = seconds + int(ns) / 1e+9
-
-    return seconds
-
 def two_directional_prop(melted):
     for node_id in list(melted.FromIndex.unique()):
         subset_to = melted[melted['ToIndex'] == node_id]
@@ -298,38 +171,6 @@ def two_directional_prop(melted):
     propagation.to_csv('static_data/melted_propagation_{}.csv'.format(timestamp), index=False, sep=',')
     return propagation
 
-def melt_propagation(process_id):
-    propagation = pd.read_csv('mp/{}_propagation.csv'.format(process_id))
-
-    try:
-        propagation = propagation.dropna()
-        propagation = propagation.astype({'FromIndex': 'int'})
-        propagation = propagation.astype({'ToIndex': 'int'})
-  
-        propagation.to_csv('mp/{}_melted.csv'.format(process_id), index=False, sep=',')
-    except Exception as e:
-        print (e)
-        pass
-
-def append_melted():
-    for i in range(0, 64):
-        tmp = pd.read_csv('mp/{}_propagation.csv'.format(i))
-        tmp = tmp.dropna()
-        tmp = tmp.astype({'FromIndex': 'int'})
-        tmp = tmp.astype({'ToIndex': 'int'})
-        if i == 0:
-            melted = tmp
-        else:
-            melted = melted.append(tmp, ignore_index=True)
-
-    melted = melted.dropna()
-
-    today = date.today()
-    timestamp = today.strftime('%d-%m-%Y')
-
-    melted.to_csv('static_data/melted_propagation_{}.csv'.format(timestamp), index=False, sep=',')
-    return melted
-
 def update_node_identities_and_melted(melted, node_identities):
     from_nodes = list(melted['FromIndex'].unique())
     to_nodes = list(melted['ToIndex'].unique())
@@ -376,16 +217,15 @@ def main():
     
     # STEP 2: Get measurements for all relevant nodes
     full_ip_list = parse_ip_addresses()
-    manage_processes(full_ip_list)
+    fetch_measurements(full_ip_list)
 
     # STEP 2.5 remove nodes from list where we didn't get a response
     node_identities = filter_node_identities(eu_mixnodes, out_file_eu)
 
     # STEP 3: Create propagation table from measurements
-    manage_measurement_parser(node_identities)
+    melted = parse_measurements(node_identities)
 
     # STEP 4: Assemble melted data
-    melted = append_melted()
     final_propagation = two_directional_prop(melted)
 
     # STEP 5: remove nodes from the list that are not covered in the melted data
@@ -0,0 +1,58 @@
+import os
+import json
+import asyncio
+import aiohttp
+
+# endpoint every mix node serves its latest measurements on
+VERLOC_URL = 'http://{}:8000/verloc'
+
+async def fetch_node(session, semaphore, node, ip, url=VERLOC_URL, timeout=5, retries=2, backoff=0.5):
+    # returns (node, data), data is None if the node never answered with valid JSON
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                async with session.get(url.format(ip), timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+                    r.raise_for_status()
+                    return node, await r.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            pass
+
+        # the slot is released while we wait, other nodes go ahead
+        if attempt < retries:
+            await asyncio.sleep(backoff * 2 ** attempt)
+
+    return node, None
+
+async def fetch_all(ip_list, url=VERLOC_URL, concurrency=128, timeout=5, retries=2, backoff=0.5):
+    """
+    Fetches the measurements of all nodes in ip_list (node id -> ip) with at most concurrency
+    requests in flight. All requests share one connection pool, every request has its own
+    timeout and failed requests are retried with exponential backoff.
+    Returns node id -> parsed JSON, None for nodes that did not answer.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        tasks = [fetch_node(session, semaphore, node, ip_list[node], url, timeout, retries, backoff) for node in ip_list]
+        results = await asyncio.gather(*tasks)
+
+    return dict(results)
+
+def fetch_measurements(ip_list, directory='measurements', **kwargs):
+    # writes {directory}/{node}_timings.json for every node that answered, returns the ones that did not
+    results = asyncio.run(fetch_all(ip_list, **kwargs))
+    os.makedirs(directory, exist_ok=True)
+
+    failed_nodes = []
+    for node, data in results.items():
+        if data is None:
+            failed_nodes.append(node)
+            continue
+
+        with open(os.path.join(directory, '{}_timings.json'.format(node)), 'w') as outfile:
+            json.dump(data, outfile)
+
+    print ('Fetched measurements of {} nodes, {} failed'.format(len(results) - len(failed_nodes), len(failed_nodes)))
+
+    return failed_nodes
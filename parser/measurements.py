@@ -0,0 +1,96 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+# seconds per unit of the duration strings the nodes report, e.g. '12ms 345us 678ns'
+DURATION_UNITS = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 1e-3, 'us': 1e-6, 'µs': 1e-6, 'ns': 1e-9}
+
+# longer units first, so that 'ms' is not read as 'm'
+DURATION_PATTERN = r'(\d+(?:\.\d+)?)(ns|us|µs|ms|s|m|h)'
+
+def parse_durations(durations):
+    # seconds of every duration string in one pass over all strings, NaN if it holds no duration
+    durations = pd.Series(durations, dtype=object).reset_index(drop=True)
+    parts = durations.str.extractall(DURATION_PATTERN)
+
+    seconds = parts[0].astype(float) * parts[1].map(DURATION_UNITS)
+    totals = seconds.groupby(level=0).sum()
+
+    return totals.reindex(durations.index).to_numpy(dtype=float)
+
+class MeasurementParser():
+    """
+    Parses the /verloc answers of all nodes ({node id}_timings.json) into one propagation table
+    with the columns FromIndex, ToIndex and TimeFromTo (s). Every file is read once, records are
+    collected in batches of up to batch_size measurements whose durations and identities are
+    converted together. Measurements without a minimum or towards unknown identities are dropped.
+    """
+    def __init__(self, node_identities, batch_size=100000):
+        # identity key -> node id, built once for all files
+        self.identity_ids = dict(zip(node_identities['identity_key'], node_identities['id']))
+        self.batch_size = batch_size
+
+    def read_file(self, path):
+        # (identity, minimum) of every measurement in the file
+        with open(path) as json_file:
+            data = json.load(json_file)
+
+        measurements = []
+        for record in data:
+            latest = record.get('latest_measurement')
+            if latest is not None and latest.get('minimum') is not None:
+                measurements.append((record.get('identity'), latest['minimum']))
+
+        return measurements
+
+    def convert(self, from_ids, identities, minimums):
+        to_ids = pd.Series(identities, dtype=object).map(self.identity_ids).to_numpy(dtype=float)
+        seconds = parse_durations(minimums)
+        valid = ~np.isnan(to_ids) & ~np.isnan(seconds)
+
+        return pd.DataFrame({
+            'FromIndex': np.asarray(from_ids, dtype=np.int64)[valid],
+            'ToIndex': to_ids[valid].astype(np.int64),
+            'TimeFromTo': seconds[valid],
+        })
+
+    def batches(self, paths):
+        from_ids = []
+        identities = []
+        minimums = []
+
+        for path in paths:
+            from_id = int(os.path.basename(path).split('_')[0])
+
+            try:
+                measurements = self.read_file(path)
+            except (ValueError, AttributeError, TypeError) as e:
+                # broken answers of single nodes are skipped, as before
+                print ('Skipped {}: {}'.format(path, e))
+                continue
+
+            for identity, minimum in measurements:
+                from_ids.append(from_id)
+                identities.append(identity)
+                minimums.append(minimum)
+
+            if len(from_ids) >= self.batch_size:
+                yield self.convert(from_ids, identities, minimums)
+                from_ids, identities, minimums = [], [], []
+
+        if len(from_ids) > 0:
+            yield self.convert(from_ids, identities, minimums)
+
+    def parse(self, paths):
+        # all batches end up in one table, concatenated once
+        frames = list(self.batches(paths))
+        if len(frames) == 0:
+            return self.convert([], [], [])
+
+        return pd.concat(frames, ignore_index=True)
+
+def parse_measurements(node_identities, directory='measurements', batch_size=100000):
+    paths = [os.path.join(directory, x) for x in sorted(os.listdir(directory)) if x.endswith('.json')]
+    return MeasurementParser(node_identities, batch_size).parse(paths)
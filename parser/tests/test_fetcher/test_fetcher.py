@@ -0,0 +1,84 @@
+import json
+import asyncio
+
+from aiohttp import web
+
+from fetcher import fetch_all, fetch_measurements
+
+CANNED = [{'identity': 'abc', 'latest_measurement': {'minimum': '12ms 345us'}}]
+
+async def serve(handler, action):
+    # stub of the /verloc endpoint, the ip of the node is passed in the path
+    app = web.Application()
+    app.router.add_get('/{ip}/verloc', handler)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+
+    port = runner.addresses[0][1]
+    try:
+        return await action('http://127.0.0.1:{}/{{}}/verloc'.format(port))
+    finally:
+        await runner.cleanup()
+
+def test_fetch_all_covers_every_node():
+    in_flight = []
+    max_in_flight = []
+
+    async def handler(request):
+        in_flight.append(1)
+        max_in_flight.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.pop()
+        return web.json_response(CANNED + [request.match_info['ip']])
+
+    ip_list = {x: '10.0.0.{}'.format(x) for x in range(100)}
+    results = asyncio.run(serve(handler, lambda url: fetch_all(ip_list, url, concurrency=8)))
+
+    # 100 is not a multiple of the concurrency, no node is dropped
+    assert sorted(results) == list(range(100))
+    assert all(results[x] == CANNED + [ip_list[x]] for x in results)
+    assert max(max_in_flight) <= 8
+
+def test_fetch_all_retries():
+    attempts = {}
+
+    async def handler(request):
+        ip = request.match_info['ip']
+        attempts[ip] = attempts.get(ip, 0) + 1
+
+        if ip == 'flaky' and attempts[ip] < 3:
+            return web.Response(status=503)
+        if ip == 'broken':
+            return web.Response(status=500)
+        if ip == 'invalid':
+            return web.Response(text='not json')
+        if ip == 'slow':
+            await asyncio.sleep(1)
+
+        return web.json_response(CANNED)
+
+    ip_list = {1: 'flaky', 2: 'broken', 3: 'invalid', 4: 'slow', 5: 'fine'}
+    results = asyncio.run(serve(handler, lambda url: fetch_all(ip_list, url, timeout=0.2, retries=2, backoff=0.01)))
+
+    assert results == {1: CANNED, 2: None, 3: None, 4: None, 5: CANNED}
+    assert attempts == {'flaky': 3, 'broken': 3, 'invalid': 3, 'slow': 3, 'fine': 1}
+
+def test_fetch_measurements(tmp_path):
+    async def handler(request):
+        if request.match_info['ip'] == 'down':
+            return web.Response(status=502)
+        return web.json_response(CANNED)
+
+    async def action(url):
+        # fetch_measurements runs its own event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: fetch_measurements({7: 'up', 8: 'down'}, str(tmp_path), url=url, retries=0))
+
+    failed_nodes = asyncio.run(serve(handler, action))
+
+    assert failed_nodes == [8]
+    assert [x.name for x in tmp_path.iterdir()] == ['7_timings.json']
+    assert json.loads((tmp_path / '7_timings.json').read_text()) == CANNED
@@ -0,0 +1,48 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from measurements import MeasurementParser, parse_durations, parse_measurements
+
+def write_answer(directory, node, records):
+    with open(directory / '{}_timings.json'.format(node), 'w') as outfile:
+        json.dump(records, outfile)
+
+def measurement(identity, minimum):
+    return {'identity': identity, 'latest_measurement': {'minimum': minimum, 'mean': minimum}}
+
+def test_parse_durations():
+    seconds = parse_durations(['12ms 345us 678ns', '1s 5ms', '2.5ms', '3m', 'none', None, 17])
+
+    assert np.allclose(seconds[:4], [0.012345678, 1.005, 0.0025, 180])
+    assert np.isnan(seconds[4:]).all()
+    assert len(parse_durations([])) == 0
+
+def test_parse_measurements(tmp_path):
+    node_identities = pd.DataFrame({'id': [1, 2, 3], 'identity_key': ['a', 'b', 'c']})
+
+    write_answer(tmp_path, 1, [measurement('b', '10ms'), measurement('c', '20ms 500us'), measurement('x', '5ms')])
+    # measurements that have not finished yet
+    write_answer(tmp_path, 2, [measurement('a', '11ms'), {'identity': 'c', 'latest_measurement': None}])
+    (tmp_path / '3_timings.json').write_text('not json')
+
+    propagation = parse_measurements(node_identities, str(tmp_path))
+
+    assert propagation['FromIndex'].tolist() == [1, 1, 2]
+    assert propagation['ToIndex'].tolist() == [2, 3, 1]
+    assert np.allclose(propagation['TimeFromTo'], [0.010, 0.0205, 0.011])
+    assert propagation['ToIndex'].dtype == np.int64
+
+def test_parse_batches(tmp_path):
+    node_identities = pd.DataFrame({'id': list(range(10)), 'identity_key': [str(x) for x in range(10)]})
+    for node in range(10):
+        write_answer(tmp_path, node, [measurement(str(x), '{}ms'.format(x + 1)) for x in range(10) if x != node])
+
+    paths = sorted(str(x) for x in tmp_path.iterdir())
+    parser = MeasurementParser(node_identities, batch_size=20)
+
+    # batches hold whole files
+    assert [len(x) for x in parser.batches(paths)] == [27, 27, 27, 9]
+    assert len(parser.parse(paths)) == 90
+    assert len(parser.parse([])) == 0
@@ -10,79 +10,301 @@
 import pandas as pd
 
 # Handling files, multiprocessing
+import os
+import time
+import argparse
 from tqdm import tqdm
 from datetime import date
-import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 
-# Data processing and plotting
+# Data processing, plots are in reporting and only imported on demand
 import numpy as np
-import pandas as pd
-import seaborn as sns
-import geopandas as gpd
-import matplotlib.pyplot as plt
-from shapely.geometry import Point
-from mpl_toolkits.axes_grid1 import make_axes_locatable
-from matplotlib import cm
-from vincenty import vincenty
 from statistics import median
 
 # VerLoc Components
 from localization import Localizer
+from batch_localization import BatchLocalizer
 from verification import Verifier
-from confidence import ConfidenceScorer
+from confidence import EpochConfidenceScorer
 from performance_eval import LocalizationPerformance, VerificationPerformance
-from inputs import Measurement, Node, Network, Schedule, TimingData
+from inputs import Measurement, Node, NodeTable, RaggedArray, Network, Schedule, TimingData
+from shared_arrays import SharedArrays, attach, detach
+from results import ResultSink
+from country_lookup import country_lookup
+from grid_cache import grid_cache
+from country_classifier import use_raster
+import geometry_cache
 
 # Localization Function
-def run_localization(num_references, network, timing_measurements, process_id):
+def share_inputs(network, timing_measurements):
+    # node table and RTT matrices in shared memory, written once and attached by all workers
+    node_ids = list(network)
+    nodes = [network[x] for x in node_ids]
+
+    return SharedArrays({
+        'node_id': np.array(node_ids, dtype=np.int64),
+        'identity_key': np.array([str(x.get_identity_key()) for x in nodes]),
+        'country': np.array([str(x.get_country()) for x in nodes]),
+        'country_name': np.array([str(x.country) for x in nodes]),
+        'lat': np.array([x.get_location()[0] for x in nodes], dtype=float),
+        'lon': np.array([x.get_location()[1] for x in nodes], dtype=float),
+        'timing_row': timing_measurements.get_rows(node_ids),
+        'my_rtt': timing_measurements.my_rtt,
+        'their_rtt': timing_measurements.their_rtt,
+    })
+
+def share_schedule(schedule, network, num_references):
+    # schedule as network rows, padded with -1
+    node_rows = {node_id: row for row, node_id in enumerate(network)}
+
+    rows = np.full((len(node_rows), num_references), -1, dtype=np.int64)
+    for node_id in schedule:
+        refs = [node_rows[x] for x in schedule[node_id]][:num_references]
+        rows[node_rows[node_id], :len(refs)] = refs
+
+    return SharedArrays({'schedule': rows})
+
+def build_shard(arrays, rows):
+    # compact inputs of a group of network rows, only measured references are kept
+    refs = arrays['schedule'][rows]
+    valid = refs >= 0
+    refs = np.maximum(refs, 0)
 
-    # Random assignment of references for each node. 
-    schedule = Schedule(num_references, network)
-    timing_measurements.assign_timings_to_network(schedule.get_schedule(), network)
-    schedule.add_reference_data_to_nodes(network)
+    node_timing = arrays['timing_row'][rows][:, None]
+    ref_timing = arrays['timing_row'][refs]
+    valid &= (node_timing >= 0) & (ref_timing >= 0)
 
-    ground_truth = []
+    my_times = np.where(valid, arrays['my_rtt'][np.maximum(node_timing, 0), np.maximum(ref_timing, 0)], np.nan)
+    their_times = np.where(valid, arrays['their_rtt'][np.maximum(node_timing, 0), np.maximum(ref_timing, 0)], np.nan)
+    valid &= np.isfinite(my_times) & np.isfinite(their_times)
 
-    loc_computations = []
-    localization_results = []
+    ref_locations = np.stack([arrays['lat'][refs], arrays['lon'][refs]], axis=-1)
 
-    confidence_results = []
-    confidence_details = {'node': [], 'score': [], 'fast': [], 'slow': [], 'identity_key': [], 'node_id': []}
-    for i, node_id in enumerate(tqdm(network)):
-        node = network[node_id]
+    table = NodeTable(arrays['node_id'][rows], arrays['identity_key'][rows], [None] * len(rows),
+        arrays['lat'][rows], arrays['lon'][rows], arrays['country'][rows], arrays['country_name'][rows])
+    table.set_measurements(my_times, their_times, ref_locations, valid)
+    # node ids of the measured references, aligned with the measurements
+    table.schedule = RaggedArray.from_mask(arrays['node_id'][refs], valid)
 
-        node_loc = Localizer(node.get_my_measurements(), node.get_their_measurements(), node.get_ref_locations())
-        node_conf = ConfidenceScorer(node)
+    return table
+
+def localize_shard(spec, rows, batch=False):
+    # runs in a worker process on shared inputs, returns one row per node
+    try:
+        table = build_shard(attach(spec), rows)
+    finally:
+        # the shard holds copies, every task lets go of the shared memory right away
+        detach(spec)
+    num_nodes = len(table)
+
+    if batch:
+        # localize all nodes of the shard at once, the duration is spread evenly over the nodes
+        start = time.time()
+        batch_loc = BatchLocalizer.from_table(table)
+        batch_estimates, batch_iterations = batch_loc.estimate_locations()
+        batch_duration = (time.time() - start) / max(num_nodes, 1)
+
+    # confidence of the whole shard in one vectorized pass
+    confidence_scores, fast_violations, slow_violations = EpochConfidenceScorer.from_table(table).compute_confidence()
+
+    results = {'node': [], 'node_id': [], 'identity_key': [], 'lat': [], 'lon': [], 'est_lat': [], 'est_lon': [], 'comp': [], 'score': [], 'fast': [], 'slow': []}
+    for i in range(num_nodes):
+        node = table.view(i)
 
         # localize
-        localization_decision, loc_duration = node_loc.estimate_location()
-        node_confidence, fast_violations, slow_violations = node_conf.compute_confidence()
-
-        confidence_details['node'].append(node_id)
-        confidence_details['score'].append(node_confidence)
-        confidence_details['fast'].append(fast_violations)
-        confidence_details['slow'].append(slow_violations)
-
-        confidence_details['identity_key'].append(node.get_identity_key())
-        confidence_details['node_id'].append(node.get_node_id())
-
-        # write results
-        ground_truth.append(node.get_location())
-
-        localization_results.append(tuple(localization_decision))
-        confidence_results.append(node_confidence)
-        loc_computations.append(loc_duration)
-    
-    confidence_df = pd.DataFrame.from_dict(confidence_details)
-    loc_performance = LocalizationPerformance(ground_truth, localization_results, loc_computations, confidence_df, process_id)
-    
+        if batch:
+            localization_decision, loc_duration = batch_estimates[i], batch_duration
+        else:
+            node_loc = Localizer(node.get_my_measurements(), node.get_their_measurements(), node.get_ref_locations())
+            localization_decision, loc_duration = node_loc.estimate_location()
+
+        results['node'].append(node.get_node_id())
+        results['node_id'].append(node.get_node_id())
+        results['identity_key'].append(node.get_identity_key())
+        results['lat'].append(node.get_location()[0])
+        results['lon'].append(node.get_location()[1])
+        results['est_lat'].append(localization_decision[0])
+        results['est_lon'].append(localization_decision[1])
+        results['comp'].append(loc_duration)
+        results['score'].append(confidence_scores[i])
+        results['fast'].append(fast_violations[i])
+        results['slow'].append(slow_violations[i])
+
+    return pd.DataFrame.from_dict(results)
+
+def run_localization(num_references, network, timing_measurements, process_id, num_workers=1, seed=None, batch=False, shared_inputs=None, schedule=None, sink=None):
+    owns_inputs = shared_inputs is None
+    if owns_inputs:
+        shared_inputs = share_inputs(network, timing_measurements)
+
+    # Random assignment of references for each node.
+    if schedule is None:
+        schedule = Schedule(num_references, network, seed).get_schedule()
+    shared_schedule = share_schedule(schedule, network, num_references)
+    spec = {**shared_inputs.get_spec(), **shared_schedule.get_spec()}
+
+    # every worker gets a disjoint range of network rows and attaches to the shared arrays
+    num_shards = max(min(num_workers, len(network)), 1)
+    shards = np.array_split(np.arange(len(network)), num_shards)
+
+    try:
+        if num_workers > 1:
+            with ProcessPoolExecutor(max_workers=num_workers) as pool:
+                futures = [pool.submit(localize_shard, spec, rows, batch) for rows in shards]
+                shard_results = [f.result() for f in tqdm(futures)]
+        else:
+            shard_results = [localize_shard(spec, rows, batch) for rows in tqdm(shards)]
+    finally:
+        shared_schedule.close()
+        if owns_inputs:
+            shared_inputs.close()
+
+    results = pd.concat(shard_results, ignore_index=True)
+
+    ground_truth = list(zip(results['lat'], results['lon']))
+    localization_results = list(zip(results['est_lat'], results['est_lon']))
+    confidence_df = results[['node', 'score', 'fast', 'slow', 'identity_key', 'node_id']]
+
+    loc_performance = LocalizationPerformance(ground_truth, localization_results, list(results['comp']), confidence_df, process_id, sink)
+
     # loc_performance.prepare_summary()
     loc_performance.write_stats()
 
+    return results
+
+# countries of the static node identities, looked up once and kept on disk
+NODE_COUNTRIES_PATH = 'cache/node_countries.npz'
+
+def prepare_country_lookup(network, path=NODE_COUNTRIES_PATH):
+    lookup = country_lookup()
+    lookup.load(path)
+
+    num_known = len(lookup)
+    lookup.lookup([network[x].get_location() for x in network])
+    if len(lookup) > num_known:
+        lookup.save(path)
+
+    return lookup
+
+# Verification Function
+def verify_shard(spec, rows, grid_resolution=50000, use_grid_cache=True, keep_grids=False):
+    # runs in a worker process on shared inputs, returns the decisions, the country weights and optionally the grids
+    try:
+        table = build_shard(attach(spec), rows)
+    finally:
+        detach(spec)
+
+    results = {'node_id': [], 'identity_key': [], 'lat': [], 'lon': [], 'country_code': [], 'country': [], 'decision': [], 'comp': []}
+    weights = {'node_id': [], 'country': [], 'weight': []}
+    grids = {}
+    for i in range(len(table)):
+        node = table.view(i)
+
+        start = time.time()
+        try:
+            node_ver = Verifier(node.get_my_measurements(), node.get_their_measurements(), node.get_schedule(), node.get_ref_locations(), node,
+                grid_cache() if use_grid_cache else None)
+            node_ver.grid_resolution = grid_resolution
+            decision, filtered_grid = node_ver.verify_location()
+            country_weights = getattr(node_ver, 'country_weights', {})
+        except Exception as e:
+            # e.g. too few usable references for a grid, one node must not take down the shard
+            print ('Verification failure', node.get_node_id(), e)
+            decision, filtered_grid, country_weights = -1, [], {}
+        duration = time.time() - start
+
+        results['node_id'].append(node.get_node_id())
+        results['identity_key'].append(node.get_identity_key())
+        results['lat'].append(node.get_location()[0])
+        results['lon'].append(node.get_location()[1])
+        results['country_code'].append(node.get_country())
+        results['country'].append(node.country)
+        results['decision'].append(decision)
+        results['comp'].append(duration)
+
+        # failed verifications have no weights
+        for country, weight in country_weights.items():
+            weights['node_id'].append(node.get_node_id())
+            weights['country'].append(country)
+            weights['weight'].append(weight[0])
+
+        if keep_grids:
+            grids[node.get_node_id()] = np.asarray(filtered_grid)
+
+    return pd.DataFrame.from_dict(results), pd.DataFrame.from_dict(weights), grids
+
+def init_verification_worker(raster_cell_size=None):
+    # spawned workers start without the settings of the parent, forked ones keep the raster they inherited
+    if raster_cell_size is not None:
+        use_raster(raster_cell_size)
+
+def run_verification(num_references, network, timing_measurements, process_id, num_workers=1, seed=None, shared_inputs=None, schedule=None,
+        grid_resolution=50000, use_grid_cache=True, keep_grids=False, sink=None, raster_cell_size=None):
+    owns_inputs = shared_inputs is None
+    if owns_inputs:
+        shared_inputs = share_inputs(network, timing_measurements)
+
+    if schedule is None:
+        schedule = Schedule(num_references, network, seed).get_schedule()
+    shared_schedule = share_schedule(schedule, network, num_references)
+    spec = {**shared_inputs.get_spec(), **shared_schedule.get_spec()}
+
+    # load the country geometry and the shared grid once, forked workers inherit them
+    init_verification_worker(raster_cell_size)
+    geometry_cache.preload()
+    if use_grid_cache:
+        grid_cache().get_grid(grid_resolution)
+
+    num_shards = max(min(num_workers, len(network)), 1)
+    shards = np.array_split(np.arange(len(network)), num_shards)
+
+    try:
+        if num_workers > 1:
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=init_verification_worker, initargs=(raster_cell_size,)) as pool:
+                futures = [pool.submit(verify_shard, spec, rows, grid_resolution, use_grid_cache, keep_grids) for rows in shards]
+                shard_results = [f.result() for f in tqdm(futures)]
+        else:
+            shard_results = [verify_shard(spec, rows, grid_resolution, use_grid_cache, keep_grids) for rows in tqdm(shards)]
+    finally:
+        shared_schedule.close()
+        if owns_inputs:
+            shared_inputs.close()
+
+    results = pd.concat([x[0] for x in shard_results], ignore_index=True)
+    weights = pd.concat([x[1] for x in shard_results], ignore_index=True)
+    grids = {node_id: grid for x in shard_results for node_id, grid in x[2].items()}
+
+    # physical countries from the same country index the verifier decides on
+    lookup = country_lookup()
+    physical_countries = lookup.get_names(lookup.lookup(results[['lat', 'lon']].to_numpy()))
+
+    ver_performance = VerificationPerformance(list(results['decision']), physical_countries, process_id, sink)
+    ver_performance.prepare_summary()
+
+    if sink is not None:
+        sink.add('country_weights', weights.assign(process_id=process_id))
+
+    return results, weights, grids
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='VerLoc prototype')
+    parser.add_argument('--references', type=int, default=40, help='Number of references used for the localization')
+    parser.add_argument('--nodes', type=int, default=512, help='Number of nodes in the network, limits the original number of available nodes')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes, defaults to the number of CPUs')
+    parser.add_argument('--replicates', type=int, default=1, help='Number of independent runs, each with its own random schedule')
+    parser.add_argument('--seed', type=int, default=None, help='Root seed from which all replicate seeds are spawned')
+    parser.add_argument('--batch', action='store_true', help='Localize the nodes of each worker with the batched solver')
+    parser.add_argument('--verify', action='store_true', help='Also verify the country of every node, on the same schedule')
+    parser.add_argument('--grid-resolution', type=int, default=50000, help='Distance between verification grid points in meters')
+    parser.add_argument('--raster-cell-size', type=float, default=None, help='Label countries with a precomputed raster of this cell size in degrees instead of the exact polygons')
+    parser.add_argument('--results', default=None, help='Directory for one result file per table and run, partitioned by epoch, instead of per-process files in mp/')
+    return parser.parse_args()
+
 def main():
-    num_references = 40 # Number of references used for the localization
-    num_nodes = 512     # Number of nodes in the network, limits the original number of available nodes
-    num_cores = 12      # TODO adjust according to target machine
+    args = parse_args()
+
+    num_references = args.references
+    num_nodes = args.nodes
 
     # use today's measurements to run the experiment
     today = date.today()
@@ -97,18 +319,25 @@ def main():
     timing_measurements = TimingData(timestamp)
     timing_measurements.define_available_references(network)
 
-    processes = []
-    for rep in range(0,num_cores):
-        net = network
-        mes = timing_measurements
+    # replicates are independent runs of the whole epoch, seeded separately
+    seeds = np.random.SeedSequence(args.seed).spawn(args.replicates)
+    sink = ResultSink(args.results, epoch=timestamp) if args.results is not None else None
+    # the raster also labels the node countries, so it is selected before the lookup is filled
+    if args.raster_cell_size is not None:
+        use_raster(args.raster_cell_size)
+    prepare_country_lookup(network)
+    with share_inputs(network, timing_measurements) as shared_inputs:
+        for rep, seed in enumerate(seeds):
+            # Random assignment of references for each node, shared by localization and verification
+            schedule = Schedule(num_references, network, seed).get_schedule()
 
-        processes.append(mp.Process(target=run_localization, args=(num_references, net, mes, rep, )))
+            run_localization(num_references, network, timing_measurements, rep, args.workers, seed, args.batch, shared_inputs, schedule, sink)
+            if args.verify:
+                run_verification(num_references, network, timing_measurements, rep, args.workers, seed, shared_inputs, schedule, args.grid_resolution,
+                    sink=sink, raster_cell_size=args.raster_cell_size)
 
-    for p in processes:
-        p.start()
-    
-    for p in processes:
-        p.join()
+    if sink is not None:
+        sink.flush()
 
 if __name__ == '__main__':
     main()
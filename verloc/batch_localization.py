@@ -0,0 +1,184 @@
+import numpy as np
+
+from scipy.optimize import Bounds
+
+from geodesy import haversine_gradient
+from propagation import Propagation
+from localization import EARTH_BOUNDS
+
+class BatchLocalizer():
+    """
+    Localizes many nodes at once. All inputs are padded to the largest number of references:
+    my_times and their_times have shape (n, r), reference_locations (n, r, 2) and mask (n, r)
+    is True for real measurements. Every node minimizes the same weighted error as Localizer,
+    solved with a Levenberg-Marquardt iteration that runs for all nodes simultaneously.
+    """
+    def __init__(self, my_times, their_times, reference_locations, mask=None):
+        self.earth_bounds = Bounds(*EARTH_BOUNDS)
+
+        self.my_times = np.asarray(my_times, dtype=float)
+        self.their_times = np.asarray(their_times, dtype=float)
+        self.reference_locations = np.asarray(reference_locations, dtype=float).reshape(self.my_times.shape + (2,))
+
+        if mask is None:
+            mask = np.ones(self.my_times.shape, dtype=bool)
+        self.mask = np.asarray(mask, dtype=bool) & np.isfinite(self.my_times) & np.isfinite(self.their_times)
+
+        self.prop_model = Propagation('paper')
+
+        # per-node constants, padded entries get a weight of 0
+        self.mean_prop_time = np.where(self.mask, np.add(self.my_times, self.their_times) / 2, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse_times = np.where(self.mask, 1 / self.mean_prop_time, 0)
+            self.error_weights = inverse_times / np.sum(np.abs(inverse_times), axis=1, keepdims=True)
+        self.error_weights[~np.isfinite(self.error_weights)] = 0
+
+        self.num_references = self.mask.sum(axis=1)
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        # pads the measurements and reference locations of a list of inputs.Node
+        num_nodes = len(nodes)
+        max_references = max([len(x.get_my_measurements()) for x in nodes] + [0])
+
+        my_times = np.zeros((num_nodes, max_references))
+        their_times = np.zeros((num_nodes, max_references))
+        reference_locations = np.zeros((num_nodes, max_references, 2))
+        mask = np.zeros((num_nodes, max_references), dtype=bool)
+
+        for i, node in enumerate(nodes):
+            num_refs = len(node.get_my_measurements())
+            my_times[i, :num_refs] = node.get_my_measurements()
+            their_times[i, :num_refs] = node.get_their_measurements()
+            reference_locations[i, :num_refs] = np.asarray(node.get_ref_locations(), dtype=float).reshape(-1, 2)[:num_refs]
+            mask[i, :num_refs] = True
+
+        return cls(my_times, their_times, reference_locations, mask)
+
+    @classmethod
+    def from_table(cls, table):
+        # pads the ragged measurements of an inputs.NodeTable without going through node objects
+        lengths = table.my_measurements.get_lengths()
+        rows = table.my_measurements.get_rows()
+        columns = np.arange(len(rows)) - table.my_measurements.offsets[rows]
+
+        shape = (len(table), max(lengths.max(initial=0), 0))
+        my_times = np.zeros(shape)
+        their_times = np.zeros(shape)
+        reference_locations = np.zeros(shape + (2,))
+        mask = np.zeros(shape, dtype=bool)
+
+        my_times[rows, columns] = table.my_measurements.values
+        their_times[rows, columns] = table.their_measurements.values
+        reference_locations[rows, columns] = table.reference_locations.values
+        mask[rows, columns] = True
+
+        return cls(my_times, their_times, reference_locations, mask)
+
+    def prepare_initial_guess(self):
+        # centroid of the polygon spanned by the references in schedule order, like Localizer
+        x = self.reference_locations[..., 0]
+        y = self.reference_locations[..., 1]
+
+        # close every polygon with its own first vertex, padded entries repeat the last real vertex
+        last = np.maximum(self.num_references - 1, 0)
+        rows = np.arange(len(x))[:, None]
+        cols = np.minimum(np.arange(x.shape[1])[None, :], last[:, None])
+        x = x[rows, cols]
+        y = y[rows, cols]
+        x_next = np.concatenate([x[:, 1:], x[:, :1]], axis=1)
+        y_next = np.concatenate([y[:, 1:], y[:, :1]], axis=1)
+
+        cross = x * y_next - x_next * y
+        area = np.sum(cross, axis=1) / 2
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            centroid = np.stack([np.sum((x + x_next) * cross, axis=1), np.sum((y + y_next) * cross, axis=1)], axis=1) / (6 * area[:, None])
+
+            # degenerate polygons (less than 3 references, all on a line) use the mean location
+            mean = np.sum(self.reference_locations * self.mask[..., None], axis=1) / self.num_references[:, None]
+
+        guess = np.where((area != 0)[:, None] & np.isfinite(centroid), centroid, mean)
+
+        return np.clip(guess, self.earth_bounds.lb, self.earth_bounds.ub)
+
+    def residuals(self, estimates, nodes):
+        # weighted errors (k, r) and their jacobian (k, r, 2) for the node rows in nodes
+        distances, gradient = haversine_gradient(estimates, self.reference_locations[nodes])
+        distances = distances * 1000
+        gradient = gradient * 1000
+
+        speeds = self.prop_model.get_time(distances)
+        speed_slopes = self.prop_model.get_slope(distances)
+
+        weights = self.error_weights[nodes]
+        times = self.mean_prop_time[nodes]
+
+        residuals = (distances - times * speeds) * weights
+        jacobian = ((1 - times * speed_slopes) * weights)[..., None] * gradient
+
+        return residuals, jacobian
+
+    def estimate_locations(self, max_iterations=100, tolerance=1e-10):
+        # returns the estimates (n, 2) and the number of iterations per node
+        estimates = self.prepare_initial_guess()
+        iterations = np.zeros(len(estimates), dtype=np.int64)
+
+        # nodes without any reference cannot be localized
+        active = self.num_references > 0
+        estimates[~active] = np.nan
+
+        nodes = np.flatnonzero(active)
+        residuals, jacobian = self.residuals(estimates[nodes], nodes)
+        costs = np.zeros(len(estimates))
+        costs[nodes] = np.sum(residuals ** 2, axis=1)
+
+        residuals_all = np.zeros(self.mask.shape)
+        jacobian_all = np.zeros(self.mask.shape + (2,))
+        residuals_all[nodes] = residuals
+        jacobian_all[nodes] = jacobian
+
+        damping = np.full(len(estimates), 1e-3)
+
+        for iteration in range(max_iterations):
+            nodes = np.flatnonzero(active)
+            if len(nodes) == 0:
+                break
+
+            residuals = residuals_all[nodes]
+            jacobian = jacobian_all[nodes]
+
+            # 2x2 normal equations per node with Marquardt scaling, solved in closed form
+            jtj = np.einsum('kri,krj->kij', jacobian, jacobian)
+            jtr = np.einsum('kri,kr->ki', jacobian, residuals)
+
+            a = jtj[:, 0, 0] * (1 + damping[nodes]) + 1e-12
+            d = jtj[:, 1, 1] * (1 + damping[nodes]) + 1e-12
+            b = jtj[:, 0, 1]
+            det = a * d - b * b
+            step = -np.stack([d * jtr[:, 0] - b * jtr[:, 1], a * jtr[:, 1] - b * jtr[:, 0]], axis=1) / det[:, None]
+
+            candidates = np.clip(estimates[nodes] + step, self.earth_bounds.lb, self.earth_bounds.ub)
+            new_residuals, new_jacobian = self.residuals(candidates, nodes)
+            new_costs = np.sum(new_residuals ** 2, axis=1)
+
+            iterations[nodes] += 1
+            moved = np.abs(candidates - estimates[nodes]).max(axis=1)
+
+            # accept improving steps, otherwise increase the damping
+            improved = new_costs < costs[nodes]
+            accepted = nodes[improved]
+            gain = np.where(improved, costs[nodes] - new_costs, 0)
+
+            estimates[accepted] = candidates[improved]
+            costs[accepted] = new_costs[improved]
+            residuals_all[accepted] = new_residuals[improved]
+            jacobian_all[accepted] = new_jacobian[improved]
+            damping[nodes] = np.where(improved, damping[nodes] / 10, damping[nodes] * 10)
+
+            # per-node convergence: no relevant improvement, no movement left or no acceptable step
+            converged = (improved & ((gain <= tolerance * costs[nodes]) | (moved < 1e-12))) | (damping[nodes] > 1e10)
+            converged |= ~improved & (np.abs(step).max(axis=1) < 1e-12)
+            active[nodes[converged]] = False
+
+        return estimates, iterations
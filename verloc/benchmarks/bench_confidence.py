@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Confidence scoring benchmark
+   Run from verloc/ (like VerLoc.py):
+
+   python benchmarks/bench_confidence.py
+"""
+
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, '.')
+sys.path.insert(0, 'benchmarks')
+
+from inputs import NodeTable
+from confidence import ConfidenceScorer, EpochConfidenceScorer
+from bench_inputs import synthetic_network
+
+def synthetic_table(num_nodes, num_references=40, seed=0):
+    # random measurements between 0.5x and 3x of the propagation time at 2/3c
+    rng = np.random.default_rng(seed)
+    table = NodeTable.from_network(synthetic_network(num_nodes, num_available=1, seed=seed))
+
+    ref_locations = rng.uniform([36, -10], [60, 30], size=(num_nodes, num_references, 2))
+    my_times = rng.uniform(1, 40, size=(num_nodes, num_references))
+    their_times = my_times * rng.uniform(0.8, 1.2, size=(num_nodes, num_references))
+    table.set_measurements(my_times, their_times, ref_locations, np.ones((num_nodes, num_references), dtype=bool))
+
+    return table
+
+def bench_confidence(sizes=(512, 5000), num_references=40):
+    for num_nodes in sizes:
+        table = synthetic_table(num_nodes, num_references)
+
+        start = time.time()
+        for i in range(len(table)):
+            ConfidenceScorer(table.view(i)).compute_confidence()
+        loop_duration = time.time() - start
+
+        start = time.time()
+        EpochConfidenceScorer.from_table(table).compute_confidence()
+        epoch_duration = time.time() - start
+
+        print ('Confidence: {} nodes, {} references'.format(num_nodes, num_references))
+        print ('  per node:  {:.3f}s'.format(loop_duration))
+        print ('  per epoch: {:.3f}s'.format(epoch_duration))
+        print ('  speedup:   {:.0f}x'.format(loop_duration / max(epoch_duration, 1e-9)))
+
+if __name__ == '__main__':
+    bench_confidence()
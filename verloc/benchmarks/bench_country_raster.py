@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Country raster benchmark: accuracy and labeling time of CountryRaster against the exact
+   polygon test of CountryClassifier, for several cell sizes. Run from verloc/ (like VerLoc.py);
+   set VERLOC_WORLD_PATH to use another Natural Earth file than the one of geopandas:
+
+   python benchmarks/bench_country_raster.py
+"""
+
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, '.')
+
+from country_classifier import CountryClassifier, CountryRaster
+from localization import EARTH_BOUNDS
+
+def bench_country_raster(cell_sizes=(0.5, 0.25, 0.1, 0.05), num_points=200000, seed=0):
+    classifier = CountryClassifier.from_europe()
+
+    # uniform points over the localization search space
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(*EARTH_BOUNDS, size=(num_points, 2))
+
+    start = time.time()
+    expected = classifier.classify(points)
+    polygon_duration = time.time() - start
+
+    print ('Country labels: {} points, {} countries'.format(num_points, len(classifier.get_names())))
+    print ('  polygons: {:.3f}s'.format(polygon_duration))
+
+    for cell_size in cell_sizes:
+        start = time.time()
+        raster = CountryRaster.build(classifier, cell_size=cell_size)
+        build_duration = time.time() - start
+
+        start = time.time()
+        labels = raster.classify(points)
+        exact_duration = time.time() - start
+
+        raster.exact_borders = False
+        start = time.time()
+        approximate = raster.classify(points)
+        approximate_duration = time.time() - start
+
+        print ('  raster {} deg: {} cells, {:.1%} border, built in {:.1f}s'.format(cell_size, raster.labels.size, raster.get_border_fraction(), build_duration))
+        print ('    exact borders:  {:.3f}s, accuracy {:.4%}'.format(exact_duration, np.mean(labels == expected)))
+        print ('    cell centers:   {:.3f}s, accuracy {:.4%}'.format(approximate_duration, np.mean(approximate == expected)))
+
+if __name__ == '__main__':
+    bench_country_raster()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Cold start benchmark of the compute entry point
+   Every measurement is a fresh interpreter, like a worker process that is spawned. Run from
+   verloc/ (like VerLoc.py):
+
+   python benchmarks/bench_imports.py
+"""
+
+import sys
+import time
+import subprocess
+
+from statistics import median
+
+# reports the peak resident memory of the interpreter in MB, Linux reports ru_maxrss in KB
+PROBE = '''
+import sys, resource
+sys.path.insert(0, '.')
+{}
+print (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+'''
+
+def cold_start(statement, repetitions=5):
+    durations = []
+    memory = []
+    for rep in range(repetitions):
+        start = time.time()
+        output = subprocess.run([sys.executable, '-c', PROBE.format(statement)], check=True, capture_output=True, text=True).stdout
+        durations.append(time.time() - start)
+        memory.append(float(output.split()[-1]))
+
+    return median(durations), median(memory)
+
+def bench_imports():
+    variants = [
+        ('interpreter only', 'pass'),
+        ('VerLoc', 'import VerLoc'),
+        ('VerLoc + reporting', 'import VerLoc, reporting'),
+    ]
+
+    print ('Cold start of the compute entry point')
+    for name, statement in variants:
+        duration, memory = cold_start(statement)
+        print ('  {:<20} {:.3f}s, {:.0f} MB'.format(name + ':', duration, memory))
+
+if __name__ == '__main__':
+    bench_imports()
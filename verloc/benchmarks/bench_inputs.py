@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Input preparation benchmarks
+   Run from verloc/ (like VerLoc.py) so that the relative paths to parser/static_data resolve:
+
+   python benchmarks/bench_inputs.py
+"""
+
+import sys
+import time
+import tempfile
+
+import numpy as np
+from random import shuffle
+
+sys.path.insert(0, '.')
+
+from inputs import Network, Node, Schedule, TimingData
+
+def scan_pair_timings(propagation, node, ref):
+    # the previous implementation: boolean-mask scans over the full table for every pair
+    try:
+        my_rtt = propagation[(propagation['FromIndex'] == node) & (propagation['ToIndex'] == ref)].iloc[0]['TimeFromTo']
+    except:
+        my_rtt = propagation[(propagation['ToIndex'] == node) & (propagation['FromIndex'] == ref)].iloc[0]['TimeToFrom']
+
+    try:
+        their_rtt = propagation[(propagation['FromIndex'] == node) & (propagation['ToIndex'] == ref)].iloc[0]['TimeToFrom']
+    except:
+        their_rtt = propagation[(propagation['ToIndex'] == node) & (propagation['FromIndex'] == ref)].iloc[0]['TimeFromTo']
+
+    return my_rtt, their_rtt
+
+def synthetic_network(num_nodes, num_available=200, num_locations=300, seed=0):
+    # random nodes spread over a fixed set of cities, each with a random subset of measured peers
+    rng = np.random.default_rng(seed)
+    locations = rng.uniform([36, -10], [60, 30], size=(num_locations, 2))
+
+    network = {}
+    for node_id in range(num_nodes):
+        lat, lon = locations[node_id % num_locations]
+        network[node_id] = Node(node_id, 'key', 'ip', lat, lon, 'DEU', 'Germany')
+
+    for node_id in network:
+        network[node_id].set_available_references(rng.choice(num_nodes, size=min(num_available, num_nodes), replace=False))
+
+    return network
+
+def loop_schedule(num_references, network):
+    # the previous implementation: list scans for chosen references and locations in every retry
+    references = {node: [] for node in network}
+    for node_id in network:
+        node = network[node_id]
+        missing_references = num_references - len(references[node_id])
+
+        iter_cnt = 0
+        while missing_references > 0:
+            missing_references = num_references - len(references[node_id])
+
+            filtered_refs = []
+            locations = []
+            for candidate in node.get_available_references():
+                if candidate not in references[node_id] and candidate != node_id:
+                    ref_loc = network[candidate].get_location()
+                    if ref_loc not in locations and ref_loc != node.get_location():
+                        filtered_refs.append(candidate)
+                        locations.append(ref_loc)
+
+            iter_cnt = iter_cnt + 1
+            if iter_cnt > 10:
+                break
+
+            shuffle(filtered_refs)
+            references[node_id].extend(filtered_refs[:missing_references])
+
+        for r in references[node_id]:
+            if num_references - len(references[r]) > 0 and node_id not in references[r]:
+                references[r].append(node_id)
+
+    return references
+
+def bench_schedule(sizes=(512, 5000, 50000), num_references=40, loop_limit=5000):
+    for num_nodes in sizes:
+        network = synthetic_network(num_nodes)
+
+        start = time.time()
+        Schedule(num_references, network, seed=0)
+        fast_duration = time.time() - start
+
+        if num_nodes <= loop_limit:
+            start = time.time()
+            loop_schedule(num_references, network)
+            loop_duration = '{:.3f}s'.format(time.time() - start)
+        else:
+            loop_duration = 'skipped'
+
+        print ('Schedule: {} nodes, {} references'.format(num_nodes, num_references))
+        print ('  list scans: {}'.format(loop_duration))
+        print ('  masks:      {:.3f}s'.format(fast_duration))
+
+def bench_available_references(num_nodes=512):
+    network = Network('25-06-2021', num_nodes).get_network()
+    timing = TimingData('25-06-2021')
+    propagation = timing.propagation
+
+    start = time.time()
+    for node_id in network:
+        # the previous implementation: two table filters and a list scan per node
+        prop_subset_from = list(propagation[propagation['FromIndex'] == node_id]['ToIndex'])
+        prop_subset_to = list(propagation[propagation['ToIndex'] == node_id]['FromIndex'])
+        available_references = prop_subset_from + list(set(prop_subset_from) - set(prop_subset_to))
+        available_references = [x for x in available_references if x in network.keys()]
+    scan_duration = time.time() - start
+
+    start = time.time()
+    timing.define_available_references(network)
+    grouped_duration = time.time() - start
+
+    print ('define_available_references: {} nodes'.format(num_nodes))
+    print ('  per-node filters: {:.3f}s'.format(scan_duration))
+    print ('  single groupby:   {:.3f}s'.format(grouped_duration))
+
+def bench_assign_timings(num_nodes=512, num_references=40):
+    network = Network('25-06-2021', num_nodes).get_network()
+
+    start = time.time()
+    timing = TimingData('25-06-2021')
+    index_duration = time.time() - start
+
+    timing.define_available_references(network)
+    schedule = Schedule(num_references, network).get_schedule()
+    num_pairs = sum(len(schedule[x]) for x in schedule)
+
+    start = time.time()
+    for node in schedule:
+        for ref in schedule[node]:
+            scan_pair_timings(timing.propagation, node, ref)
+    scan_duration = time.time() - start
+
+    start = time.time()
+    timing.assign_timings_to_network(schedule, network)
+    lookup_duration = time.time() - start
+
+    print ('assign_timings_to_network: {} nodes, {} pairs'.format(num_nodes, num_pairs))
+    print ('  table scans:  {:.3f}s'.format(scan_duration))
+    print ('  pair index:   {:.3f}s (+ {:.3f}s one-off build)'.format(lookup_duration, index_duration))
+    print ('  speedup:      {:.0f}x'.format(scan_duration / max(lookup_duration, 1e-9)))
+
+def bench_load(repeat=5):
+    path = '../parser/static_data/melted_propagation_25-06-2021.csv'
+    cache_directory = tempfile.mkdtemp()
+
+    timing = TimingData('25-06-2021', cache_directory=None)
+
+    start = time.time()
+    for _ in range(repeat):
+        timing.load(path, None)
+    parse_duration = (time.time() - start) / repeat
+
+    start = time.time()
+    timing.load(path, cache_directory)
+    build_duration = time.time() - start
+
+    start = time.time()
+    for _ in range(repeat):
+        timing.load(path, cache_directory)
+    cached_duration = (time.time() - start) / repeat
+
+    print ('TimingData.load: {} pairs, {} nodes'.format(len(timing.propagation), len(timing.node_ids)))
+    print ('  read_csv + pair index: {:.3f}s'.format(parse_duration))
+    print ('  memory-mapped cache:   {:.3f}s (+ {:.3f}s one-off build)'.format(cached_duration, build_duration))
+
+if __name__ == '__main__':
+    bench_schedule()
+    bench_available_references()
+    bench_assign_timings()
+    bench_load()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Verification benchmarks
+   Run from verloc/ (like VerLoc.py); set VERLOC_WORLD_PATH to use another Natural Earth
+   file than the one of geopandas:
+
+   python benchmarks/bench_verification.py
+"""
+
+import sys
+import time
+
+import geopy
+import geopy.distance
+import numpy as np
+
+sys.path.insert(0, '.')
+
+from verification import Verifier
+from geodesy import one_to_many
+from propagation import Propagation
+from grid_cache import GridCache
+
+def geodesic_grid(reference_location, num_points, grid_resolution):
+    # the previous implementation: one geodesic solve per grid point
+    def compute_grid(center_point, bearing, point_range):
+        partial_grid = []
+        for i in point_range:
+            d = geopy.distance.geodesic(meters = grid_resolution * i)
+            grid_point = d.destination(point=center_point, bearing=bearing)
+            partial_grid.append((grid_point.latitude, grid_point.longitude))
+        return partial_grid
+
+    center = geopy.Point(reference_location)
+    lat_grid = compute_grid(center, 0, range(num_points,0,-1)) + [reference_location] + compute_grid(center, 180, range(1,num_points+1))
+
+    lat_lon_grid = []
+    for lat_point in lat_grid:
+        center = geopy.Point(lat_point)
+        lat_lon_grid.extend(compute_grid(center, -90, range(num_points,0,-1)))
+        lat_lon_grid.append(lat_point)
+        lat_lon_grid.extend(compute_grid(center, 90, range(1,num_points+1)))
+
+    return lat_lon_grid
+
+def bench_grid(resolutions=(50000, 25000, 10000), radius=1500000, loop_min_resolution=25000):
+    reference_location = (48.3200536664685, 17.3730031429023)
+    ver = Verifier([0.01], [0.01], [0], [reference_location], None)
+
+    for grid_resolution in resolutions:
+        num_points = int(radius / grid_resolution)
+        ver.grid_resolution = grid_resolution
+
+        start = time.time()
+        ver.compute_lat_grid(reference_location, num_points)
+        ver.compute_full_grid(num_points)
+        vector_duration = time.time() - start
+
+        if grid_resolution >= loop_min_resolution:
+            start = time.time()
+            geodesic_grid(reference_location, num_points, grid_resolution)
+            loop_duration = '{:.3f}s'.format(time.time() - start)
+        else:
+            loop_duration = 'skipped'
+
+        print ('Grid: {} m resolution, {} points'.format(grid_resolution, len(ver.lat_lon_grid)))
+        print ('  geodesic per point: {}'.format(loop_duration))
+        print ('  vectorized:         {:.3f}s'.format(vector_duration))
+
+def loop_weights(ver):
+    # the previous implementation: one distance pass and one array per reference
+    prop = Propagation('paper')
+    diffs = []
+    for elem in ver.sorted_propagation:
+        distances = one_to_many(ver.reference_locations[int(elem[2])], ver.lat_lon_grid) * 1000
+        times = distances / prop.get_time(distances)
+        diffs.append((np.absolute(times - ver.my_times[int(elem[2])]) + np.absolute(times - ver.their_times[int(elem[2])])) / 2)
+
+    return np.mean(np.array(diffs) / np.amax(diffs), axis=0)
+
+def bench_weighting(resolutions=(50000, 25000, 10000), radius=1000000, num_references=40, seed=0):
+    rng = np.random.default_rng(seed)
+    reference_locations = rng.uniform([40, -5], [55, 25], size=(num_references, 2))
+    my_times = rng.uniform(0.005, 0.04, num_references)
+    their_times = my_times * rng.uniform(0.9, 1.1, num_references)
+
+    ver = Verifier(my_times, their_times, list(range(num_references)), reference_locations, None)
+    ver.sort_by_time()
+
+    for grid_resolution in resolutions:
+        num_points = int(radius / grid_resolution)
+        ver.grid_resolution = grid_resolution
+        ver.compute_lat_grid(reference_locations[0], num_points)
+        ver.compute_full_grid(num_points)
+
+        start = time.time()
+        loop_weights(ver)
+        loop_duration = time.time() - start
+
+        durations = []
+        for dtype in (np.float64, np.float32):
+            ver.weight_dtype = dtype
+            start = time.time()
+            ver.weight_cropped_area()
+            durations.append(time.time() - start)
+
+        print ('Weighting: {} references, {} grid points'.format(num_references, len(ver.lat_lon_grid)))
+        print ('  per reference:  {:.3f}s'.format(loop_duration))
+        print ('  matrix float64: {:.3f}s'.format(durations[0]))
+        print ('  matrix float32: {:.3f}s'.format(durations[1]))
+
+def bench_grid_cache(resolutions=(50000, 10000), num_targets=200, radius=1000000, seed=0):
+    rng = np.random.default_rng(seed)
+    reference_locations = rng.uniform([40, -5], [55, 25], size=(num_targets, 2))
+    cache = GridCache()
+
+    for grid_resolution in resolutions:
+        num_points = int(radius / grid_resolution)
+        ver = Verifier([0.01], [0.01], [0], reference_locations, None, grid_cache=cache)
+        ver.grid_resolution = grid_resolution
+
+        start = time.time()
+        for reference_location in reference_locations:
+            ver.compute_lat_grid(reference_location, num_points)
+            ver.compute_full_grid(num_points)
+            ver.crop_to_land()
+        generate_duration = time.time() - start
+
+        start = time.time()
+        cache.get_grid(grid_resolution)
+        build_duration = time.time() - start
+
+        start = time.time()
+        for reference_location in reference_locations:
+            ver.select_cached_grid(reference_location, radius)
+            ver.crop_to_land()
+        cached_duration = time.time() - start
+
+        print ('Grid cache: {} targets, {} m resolution'.format(num_targets, grid_resolution))
+        print ('  generated per target: {:.3f}s'.format(generate_duration))
+        print ('  shared grid:          {:.3f}s (+ {:.3f}s one-off build)'.format(cached_duration, build_duration))
+
+if __name__ == '__main__':
+    bench_grid()
+    bench_weighting()
+    bench_grid_cache()
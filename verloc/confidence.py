@@ -1,26 +1,34 @@
-from math import exp
+import numpy as np
+
 from scipy import constants
-from vincenty import vincenty
+from geodesy import one_to_many, distances as pair_distances
+
+GRACE_FACTOR = 0.2
+UPPER_BOUND_SPEED = ((2/3) * constants.speed_of_light) / 1000
+
+def lower_bound_function(x):
+    # empirical lower speed bound, x is the distance in m
+    return (5.934e+07 * np.exp(1.742e-07*x) -4.529e+07 * np.exp(-2.564e-06*x)) / 1000
+
+def lower_bound_speeds(distances, grace_factor=GRACE_FACTOR):
+    lower_bound = lower_bound_function(np.asarray(distances, dtype=float))
+    return lower_bound - lower_bound * grace_factor
 
 class ConfidenceScorer():
     def __init__(self, node):
         ref_locations = node.get_ref_locations()
         my_location = node.get_location()
 
-        distances = []
-        for ref_loc in ref_locations:
-            distances.append(vincenty(my_location, ref_loc) * 1000)
+        distances = list(one_to_many(my_location, ref_locations) * 1000)
 
         self.distances = distances
         self.my_times = node.get_my_measurements()
         self.their_times = node.get_their_measurements()
-        
-        lower_bound_function = lambda x: (5.934e+07 * exp(1.742e-07*x) -4.529e+07 * exp(-2.564e-06*x)) / 1000
 
-        self.grace_factor = 0.2
-        self.lower_bound_speed = [(lower_bound_function(x) - lower_bound_function(x) * self.grace_factor) for x in distances]
-        self.upper_bound_speed = ((2/3) * constants.speed_of_light) / 1000
-        
+        self.grace_factor = GRACE_FACTOR
+        self.lower_bound_speed = list(lower_bound_speeds(distances, self.grace_factor))
+        self.upper_bound_speed = UPPER_BOUND_SPEED
+
 
     def compute_confidence(self):
         # distances between from and to node
@@ -58,10 +66,60 @@ class ConfidenceScorer():
             fast_viol = sum(fast_violations) / len(fast_violations)
         except:
             fast_viol = 0
-        
+
         try:
             slow_viol = sum(slow_violations) / len(slow_violations)
         except:
             slow_viol = 0
 
-        return node_conf, fast_viol, slow_viol
\ No newline at end of file
+        return node_conf, fast_viol, slow_viol
+
+class EpochConfidenceScorer():
+    """
+    Confidence of all nodes of an epoch in one pass. The inputs are the flat pair table:
+    the node (row) each pair belongs to, the distance in m and both measured times.
+    compute_confidence returns the score, fast and slow fractions per node, 0 for nodes
+    without pairs, identical to ConfidenceScorer.compute_confidence node by node.
+    """
+    def __init__(self, node_index, distances, my_times, their_times, num_nodes=None):
+        self.node_index = np.asarray(node_index, dtype=np.int64)
+        self.distances = np.asarray(distances, dtype=float)
+        self.my_times = np.asarray(my_times, dtype=float)
+        self.their_times = np.asarray(their_times, dtype=float)
+
+        if num_nodes is None:
+            num_nodes = self.node_index.max(initial=-1) + 1
+        self.num_nodes = num_nodes
+
+        self.grace_factor = GRACE_FACTOR
+        self.lower_bound_speed = lower_bound_speeds(self.distances, self.grace_factor)
+        self.upper_bound_speed = UPPER_BOUND_SPEED
+
+    @classmethod
+    def from_table(cls, table):
+        # pairs of an inputs.NodeTable, distances between every node and its measured references
+        node_index = table.my_measurements.get_rows()
+        distances = pair_distances(table.locations[node_index], table.reference_locations.values) * 1000
+
+        return cls(node_index, distances, table.my_measurements.values, table.their_measurements.values, len(table))
+
+    def grouped_mean(self, flags):
+        # fraction of flagged pairs per node
+        counts = np.bincount(self.node_index, minlength=self.num_nodes)
+        totals = np.bincount(self.node_index, weights=flags.astype(float), minlength=self.num_nodes)
+
+        return np.divide(totals, counts, out=np.zeros(self.num_nodes), where=counts > 0)
+
+    def compute_confidence(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            my_speed = (self.distances / self.my_times) / 1000
+            their_speed = (self.distances / self.their_times) / 1000
+
+        lower = self.lower_bound_speed
+        upper = self.upper_bound_speed
+
+        node_confidence = (my_speed > lower) & (my_speed < upper) & (their_speed > lower) & (their_speed < upper)
+        fast_violations = (my_speed > upper) | (their_speed > upper)
+        slow_violations = (my_speed < lower) | (their_speed < lower)
+
+        return self.grouped_mean(node_confidence), self.grouped_mean(fast_violations), self.grouped_mean(slow_violations)
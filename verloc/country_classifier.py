@@ -0,0 +1,193 @@
+import os
+import hashlib
+import numpy as np
+import shapely
+
+from shapely import STRtree
+
+import geometry_cache
+
+# raster covering the European countries including Scandinavia and Iceland, (lat, lon)
+RASTER_BOUNDS = ((27.0, -25.0), (72.0, 45.0))
+RASTER_CELL_SIZE = 0.1
+RASTER_DIRECTORY = 'cache'
+
+class CountryClassifier():
+    """
+    Labels whole arrays of (lat, lon) points with the index of the country that contains them.
+    Candidates come from an STRtree over the country bounding boxes and are confirmed with the
+    vectorized shapely predicates. Points outside of all countries get -1, points in
+    overlapping countries the first country in the given order.
+    """
+    def __init__(self, geometries, names):
+        self.geometries = np.asarray(list(geometries), dtype=object)
+        self.names = list(names)
+        self.tree = STRtree(self.geometries)
+
+    @classmethod
+    def from_europe(cls):
+        europe = geometry_cache.get_europe()
+        return cls(europe['geometry'], europe['name'])
+
+    @classmethod
+    def from_world(cls):
+        world = geometry_cache.get_world()
+        return cls(world['geometry'], world['name'])
+
+    def get_names(self):
+        return self.names
+
+    def get_geometry_hash(self):
+        # identifies the country shapes, e.g. to tell rasters of different world files apart
+        digest = hashlib.sha1()
+        for name, wkb in zip(self.names, shapely.to_wkb(self.geometries)):
+            digest.update(name.encode())
+            digest.update(wkb)
+
+        return digest.hexdigest()[:16]
+
+    def classify(self, points):
+        # points is an array-like of shape (n, 2) in (lat, lon), returns int64 labels of shape (n,)
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        labels = np.full(len(points), len(self.names), dtype=np.int64)
+        if len(points) == 0 or len(self.names) == 0:
+            return np.full(len(points), -1, dtype=np.int64)
+
+        # shapely expects (x, y) = (lon, lat); within() excludes the boundary like contains()
+        point_geometries = shapely.points(points[:, 1], points[:, 0])
+        point_index, country_index = self.tree.query(point_geometries, predicate='within')
+
+        # first country wins where polygons overlap
+        np.minimum.at(labels, point_index, country_index)
+        labels[labels == len(self.names)] = -1
+
+        return labels
+
+class CountryRaster():
+    """
+    Precomputed lat/lon raster of country indices with square cells of cell_size degrees,
+    anchored at origin (lat, lon). Labeling a point is a single array lookup. Cells that
+    touch more than one country or a coastline are marked as border cells; points in them,
+    and points outside of the raster, fall back to the exact polygon test of the classifier
+    unless exact_borders is False, then border cells use the country of their center.
+    """
+    def __init__(self, classifier, labels, border, origin, cell_size, exact_borders=True):
+        self.classifier = classifier
+        self.labels = labels
+        self.border = border
+        self.origin = np.asarray(origin, dtype=float)
+        self.cell_size = cell_size
+        self.exact_borders = exact_borders
+
+    @classmethod
+    def build(cls, classifier, bounds=None, cell_size=None):
+        if bounds is None:
+            bounds = RASTER_BOUNDS
+        if cell_size is None:
+            cell_size = RASTER_CELL_SIZE
+        (lat_min, lon_min), (lat_max, lon_max) = bounds
+
+        num_rows = int(np.ceil((lat_max - lat_min) / cell_size))
+        num_cols = int(np.ceil((lon_max - lon_min) / cell_size))
+        lats, lons = np.meshgrid(lat_min + cell_size * np.arange(num_rows), lon_min + cell_size * np.arange(num_cols), indexing='ij')
+        lats = lats.ravel()
+        lons = lons.ravel()
+
+        # every cell gets the country of its center
+        labels = classifier.classify(np.stack([lats + cell_size / 2, lons + cell_size / 2], axis=1))
+
+        # a cell is pure if it touches no country at all or lies in the interior of exactly one
+        cells = shapely.box(lons, lats, lons + cell_size, lats + cell_size)
+        cell_index, country_index = classifier.tree.query(cells, predicate='intersects')
+        num_countries = np.bincount(cell_index, minlength=len(cells))
+        inside = shapely.contains_properly(classifier.geometries[country_index], cells[cell_index])
+        num_inside = np.bincount(cell_index, weights=inside, minlength=len(cells))
+
+        border = ~((num_countries == 0) | ((num_countries == 1) & (num_inside == 1)))
+
+        return cls(classifier, labels.reshape(num_rows, num_cols), border.reshape(num_rows, num_cols), (lat_min, lon_min), cell_size)
+
+    @classmethod
+    def load_or_build(cls, classifier, path=None, bounds=None, cell_size=None):
+        # the raster is written once to path and reused as long as country shapes, bounds and cell size match
+        if bounds is None:
+            bounds = RASTER_BOUNDS
+        if cell_size is None:
+            cell_size = RASTER_CELL_SIZE
+        if path is None:
+            path = os.path.join(RASTER_DIRECTORY, 'country_raster_{}.npz'.format(cell_size))
+
+        geometry_hash = classifier.get_geometry_hash()
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=False) as data:
+                # rasters written without a geometry hash are built again
+                if ('geometry_hash' in data and data['geometry_hash'] == geometry_hash and list(data['names']) == classifier.get_names()
+                        and data['cell_size'] == cell_size and np.allclose(data['bounds'], bounds)):
+                    return cls(classifier, data['labels'], data['border'], data['bounds'][0], cell_size)
+
+        raster = cls.build(classifier, bounds, cell_size)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez_compressed(path, labels=raster.labels, border=raster.border, bounds=np.asarray(bounds, dtype=float),
+                            cell_size=cell_size, names=np.array(classifier.get_names(), dtype=str), geometry_hash=geometry_hash)
+
+        return raster
+
+    def get_names(self):
+        return self.classifier.get_names()
+
+    def get_border_fraction(self):
+        return self.border.mean()
+
+    def classify(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+
+        rows = np.floor((points[:, 0] - self.origin[0]) / self.cell_size).astype(np.int64)
+        cols = np.floor((points[:, 1] - self.origin[1]) / self.cell_size).astype(np.int64)
+        in_raster = (rows >= 0) & (rows < self.labels.shape[0]) & (cols >= 0) & (cols < self.labels.shape[1])
+
+        labels = np.full(len(points), -1, dtype=np.int64)
+        labels[in_raster] = self.labels[rows[in_raster], cols[in_raster]]
+
+        exact = ~in_raster
+        if self.exact_borders:
+            exact[in_raster] = self.border[rows[in_raster], cols[in_raster]]
+        if exact.any():
+            labels[exact] = self.classifier.classify(points[exact])
+
+        return labels
+
+# optional raster for europe_classifier(), see use_raster()
+raster_settings = {}
+
+def use_raster(cell_size=RASTER_CELL_SIZE, path=None):
+    # label verification grids with a precomputed CountryRaster instead of polygons
+    settings = {'cell_size': cell_size, 'path': path}
+    if settings == raster_settings:
+        # e.g. forked pool workers that already hold the raster
+        return
+
+    raster_settings.clear()
+    raster_settings.update(settings)
+
+    # everything labeled with the previous classifier is built again
+    for key in ('europe_classifier', 'grid_cache', 'country_lookup'):
+        geometry_cache.cache.pop(key, None)
+
+def europe_classifier():
+    # shared by all verifiers of the process, like the geometries it is built from
+    if 'europe_classifier' not in geometry_cache.cache:
+        classifier = CountryClassifier.from_europe()
+        if raster_settings:
+            classifier = CountryRaster.load_or_build(classifier, **raster_settings)
+        geometry_cache.cache['europe_classifier'] = classifier
+
+    return geometry_cache.cache['europe_classifier']
+
+def world_classifier():
+    if 'world_classifier' not in geometry_cache.cache:
+        geometry_cache.cache['world_classifier'] = CountryClassifier.from_world()
+
+    return geometry_cache.cache['world_classifier']
@@ -0,0 +1,91 @@
+import os
+import numpy as np
+
+from collections import OrderedDict
+
+import geometry_cache
+
+from country_classifier import europe_classifier
+
+class CountryLookup():
+    """
+    Country index of (lat, lon) points in the classifier verification uses (-1 outside of all
+    countries), memoized in a bounded LRU keyed by the coordinates rounded to decimals places.
+    Misses are labeled in one classifier call with the rounded coordinates, so a key always maps
+    to the same country. save() and load() keep the memo on disk, e.g. for the static node
+    identities, and load() ignores files written for other countries.
+    """
+    def __init__(self, classifier=None, max_size=100000, decimals=4):
+        self.classifier = classifier if classifier is not None else europe_classifier()
+        self.max_size = max_size
+        self.decimals = decimals
+        self.memo = OrderedDict()
+
+    def __len__(self):
+        return len(self.memo)
+
+    def get_names(self, labels):
+        # country names of the labels, None outside of all countries
+        names = self.classifier.get_names()
+        return [names[x] if x >= 0 else None for x in labels]
+
+    def lookup(self, points):
+        points = np.round(np.asarray(points, dtype=float).reshape(-1, 2), self.decimals)
+        labels = np.full(len(points), -1, dtype=np.int64)
+
+        # failed estimates (NaN) have no country and are not memoized
+        valid = np.flatnonzero(np.isfinite(points).all(axis=1))
+        keys = [(points[i, 0], points[i, 1]) for i in valid]
+
+        # points of the same key are classified once
+        missing = OrderedDict()
+        for i, key in zip(valid, keys):
+            if key in self.memo:
+                self.memo.move_to_end(key)
+                labels[i] = self.memo[key]
+            else:
+                missing.setdefault(key, []).append(i)
+
+        if len(missing) > 0:
+            new_labels = self.classifier.classify(points[[x[0] for x in missing.values()]])
+            for (key, rows), label in zip(missing.items(), new_labels):
+                self.memo[key] = label
+                labels[rows] = label
+
+            while len(self.memo) > self.max_size:
+                self.memo.popitem(last=False)
+
+        return labels
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        points = np.array(list(self.memo.keys()), dtype=float).reshape(-1, 2)
+        np.savez_compressed(path, points=points, labels=np.array(list(self.memo.values()), dtype=np.int64),
+                            names=np.array(self.classifier.get_names(), dtype=str), decimals=self.decimals)
+
+    def load(self, path):
+        # returns True if the file matched the countries and rounding of this lookup
+        if not os.path.exists(path):
+            return False
+
+        with np.load(path, allow_pickle=False) as data:
+            if list(data['names']) != self.classifier.get_names() or data['decimals'] != self.decimals:
+                return False
+
+            for point, label in zip(data['points'], data['labels']):
+                self.memo[(point[0], point[1])] = label
+
+        while len(self.memo) > self.max_size:
+            self.memo.popitem(last=False)
+
+        return True
+
+def country_lookup():
+    # one lookup per process, dropped together with the geometry it was built from
+    if 'country_lookup' not in geometry_cache.cache:
+        geometry_cache.cache['country_lookup'] = CountryLookup()
+
+    return geometry_cache.cache['country_lookup']
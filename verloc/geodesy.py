@@ -0,0 +1,209 @@
+import numpy as np
+
+# WGS 84, same constants as the vincenty package
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = 6356752.314245
+
+# mean earth radius in km, used by the fast spherical mode
+EARTH_RADIUS = 6371.0088
+
+MAX_ITERATIONS = 200
+CONVERGENCE_THRESHOLD = 1e-12
+
+def as_points(points):
+    # (lat, lon) tuple, list of tuples or array -> float array of shape (..., 2)
+    points = np.asarray(points, dtype=float)
+    if points.size == 0:
+        return points.reshape(0, 2)
+    return points
+
+def vincenty_distances(lat1, lon1, lat2, lon2):
+    """
+    Vectorized inverse Vincenty on the WGS 84 ellipsoid, inputs in degrees and broadcast
+    against each other. Returns kilometers rounded like vincenty(), NaN where the iteration
+    does not converge (nearly antipodal points).
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (lat1, lon1, lat2, lon2)])
+    shape = lat1.shape
+    lat1, lon1, lat2, lon2 = [x.ravel() for x in (lat1, lon1, lat2, lon2)]
+
+    U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    L = np.radians(lon2 - lon1)
+    Lambda = L.copy()
+
+    sinU1 = np.sin(U1)
+    cosU1 = np.cos(U1)
+    sinU2 = np.sin(U2)
+    cosU2 = np.cos(U2)
+
+    sinSigma = np.zeros(L.shape)
+    cosSigma = np.ones(L.shape)
+    sigma = np.zeros(L.shape)
+    cosSqAlpha = np.ones(L.shape)
+    cos2SigmaM = np.zeros(L.shape)
+
+    # only pairs that did not converge yet are updated in each iteration
+    active = np.ones(L.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for iteration in range(MAX_ITERATIONS):
+            sinLambda = np.sin(Lambda[active])
+            cosLambda = np.cos(Lambda[active])
+            a_sinU1, a_cosU1 = sinU1[active], cosU1[active]
+            a_sinU2, a_cosU2 = sinU2[active], cosU2[active]
+
+            a_sinSigma = np.sqrt((a_cosU2 * sinLambda) ** 2 + (a_cosU1 * a_sinU2 - a_sinU1 * a_cosU2 * cosLambda) ** 2)
+            a_cosSigma = a_sinU1 * a_sinU2 + a_cosU1 * a_cosU2 * cosLambda
+            a_sigma = np.arctan2(a_sinSigma, a_cosSigma)
+            sinAlpha = np.where(a_sinSigma == 0, 0, a_cosU1 * a_cosU2 * sinLambda / a_sinSigma)
+            a_cosSqAlpha = 1 - sinAlpha ** 2
+            a_cos2SigmaM = np.where(a_cosSqAlpha == 0, 0, a_cosSigma - 2 * a_sinU1 * a_sinU2 / a_cosSqAlpha)
+            C = WGS84_F / 16 * a_cosSqAlpha * (4 + WGS84_F * (4 - 3 * a_cosSqAlpha))
+
+            LambdaPrev = Lambda[active]
+            a_Lambda = L[active] + (1 - C) * WGS84_F * sinAlpha * (a_sigma + C * a_sinSigma * (a_cos2SigmaM + C * a_cosSigma * (-1 + 2 * a_cos2SigmaM ** 2)))
+
+            sinSigma[active] = a_sinSigma
+            cosSigma[active] = a_cosSigma
+            sigma[active] = a_sigma
+            cosSqAlpha[active] = a_cosSqAlpha
+            cos2SigmaM[active] = a_cos2SigmaM
+            Lambda[active] = a_Lambda
+
+            # coincident points converge immediately
+            converged = (np.abs(a_Lambda - LambdaPrev) < CONVERGENCE_THRESHOLD) | (a_sinSigma == 0)
+            active[np.flatnonzero(active)[converged]] = False
+            if not active.any():
+                break
+
+        uSq = cosSqAlpha * (WGS84_A ** 2 - WGS84_B ** 2) / (WGS84_B ** 2)
+        A = 1 + uSq / 16384 * (4096 + uSq * (-768 + uSq * (320 - 175 * uSq)))
+        B = uSq / 1024 * (256 + uSq * (-128 + uSq * (74 - 47 * uSq)))
+        deltaSigma = B * sinSigma * (cos2SigmaM + B / 4 * (cosSigma * (-1 + 2 * cos2SigmaM ** 2) - B / 6 * cos2SigmaM * (-3 + 4 * sinSigma ** 2) * (-3 + 4 * cos2SigmaM ** 2)))
+        s = WGS84_B * A * (sigma - deltaSigma) / 1000
+
+    s = np.where(sinSigma == 0, 0.0, s)
+    s = np.where((lat1 == lat2) & (lon1 == lon2), 0.0, s)
+    s[active] = np.nan
+
+    return np.round(s, 6).reshape(shape)
+
+def vincenty_destinations(lat, lon, bearing, distance):
+    """
+    Vectorized direct Vincenty on the WGS 84 ellipsoid: the points reached from (lat, lon) in
+    degrees after distance km along the initial bearing in degrees. All inputs broadcast
+    against each other; returns latitudes and longitudes, longitudes wrapped to [-180, 180).
+    """
+    lat, lon, bearing, distance = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (lat, lon, bearing, distance)])
+
+    alpha1 = np.radians(bearing)
+    sinAlpha1 = np.sin(alpha1)
+    cosAlpha1 = np.cos(alpha1)
+
+    tanU1 = (1 - WGS84_F) * np.tan(np.radians(lat))
+    cosU1 = 1 / np.sqrt(1 + tanU1 ** 2)
+    sinU1 = tanU1 * cosU1
+
+    sigma1 = np.arctan2(tanU1, cosAlpha1)
+    sinAlpha = cosU1 * sinAlpha1
+    cosSqAlpha = 1 - sinAlpha ** 2
+    uSq = cosSqAlpha * (WGS84_A ** 2 - WGS84_B ** 2) / (WGS84_B ** 2)
+    A = 1 + uSq / 16384 * (4096 + uSq * (-768 + uSq * (320 - 175 * uSq)))
+    B = uSq / 1024 * (256 + uSq * (-128 + uSq * (74 - 47 * uSq)))
+
+    # the series converges within a few iterations for all points at once
+    s = distance * 1000
+    sigma = s / (WGS84_B * A)
+    for iteration in range(MAX_ITERATIONS):
+        cos2SigmaM = np.cos(2 * sigma1 + sigma)
+        sinSigma = np.sin(sigma)
+        cosSigma = np.cos(sigma)
+        deltaSigma = B * sinSigma * (cos2SigmaM + B / 4 * (cosSigma * (-1 + 2 * cos2SigmaM ** 2) - B / 6 * cos2SigmaM * (-3 + 4 * sinSigma ** 2) * (-3 + 4 * cos2SigmaM ** 2)))
+
+        sigmaPrev = sigma
+        sigma = s / (WGS84_B * A) + deltaSigma
+        if np.all(np.abs(sigma - sigmaPrev) < CONVERGENCE_THRESHOLD):
+            break
+
+    cos2SigmaM = np.cos(2 * sigma1 + sigma)
+    sinSigma = np.sin(sigma)
+    cosSigma = np.cos(sigma)
+
+    x = sinU1 * sinSigma - cosU1 * cosSigma * cosAlpha1
+    lat2 = np.arctan2(sinU1 * cosSigma + cosU1 * sinSigma * cosAlpha1, (1 - WGS84_F) * np.sqrt(sinAlpha ** 2 + x ** 2))
+    Lambda = np.arctan2(sinSigma * sinAlpha1, cosU1 * cosSigma - sinU1 * sinSigma * cosAlpha1)
+    C = WGS84_F / 16 * cosSqAlpha * (4 + WGS84_F * (4 - 3 * cosSqAlpha))
+    L = Lambda - (1 - C) * WGS84_F * sinAlpha * (sigma + C * sinSigma * (cos2SigmaM + C * cosSigma * (-1 + 2 * cos2SigmaM ** 2)))
+
+    lon2 = (lon + np.degrees(L) + 180) % 360 - 180
+
+    return np.degrees(lat2), lon2
+
+def destinations(point, bearings, distances):
+    # (lat, lon) points reached from point along bearings (degrees) after distances (km), shape (..., 2)
+    point = as_points(point)
+    lat, lon = vincenty_destinations(point[..., 0], point[..., 1], bearings, distances)
+
+    return np.stack([lat, lon], axis=-1)
+
+def haversine_distances(lat1, lon1, lat2, lon2):
+    # great circle distance on a sphere with the mean earth radius, in km
+    lat1, lon1, lat2, lon2 = [np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2)]
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+DISTANCE_METHODS = {
+    'vincenty': vincenty_distances,
+    'haversine': haversine_distances,
+}
+
+def distances(points_a, points_b, method='vincenty'):
+    # element-wise distances in km between (lat, lon) points, shapes broadcast like numpy arrays
+    points_a = as_points(points_a)
+    points_b = as_points(points_b)
+
+    return DISTANCE_METHODS[method](points_a[..., 0], points_a[..., 1], points_b[..., 0], points_b[..., 1])
+
+def one_to_many(point, points, method='vincenty'):
+    # distances in km from one (lat, lon) point to n points, shape (n,)
+    return distances(as_points(point).reshape(1, 2), as_points(points).reshape(-1, 2), method)
+
+def distance_matrix(points_a, points_b, method='vincenty'):
+    # distances in km between n and m points, shape (n, m)
+    points_a = as_points(points_a).reshape(-1, 1, 2)
+    points_b = as_points(points_b).reshape(1, -1, 2)
+
+    return distances(points_a, points_b, method)
+
+def haversine_gradient(point, points):
+    """
+    Spherical distances in km from one (lat, lon) point to n points, together with their
+    partial derivatives with respect to the latitude and longitude of the point in degrees,
+    shape (n,) and (n, 2). The gradient is 0 where the point coincides with a target.
+    Batches broadcast, e.g. k points of shape (k, 2) against targets of shape (k, n, 2).
+    """
+    point = as_points(point)
+    points = as_points(points)
+    lat1 = np.radians(point[..., 0])[..., None]
+    lon1 = np.radians(point[..., 1])[..., None]
+    lat2 = np.radians(points[..., 0])
+    lon2 = np.radians(points[..., 1])
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    cos_lats = np.cos(lat1) * np.cos(lat2)
+
+    a = np.clip(np.sin(dlat / 2) ** 2 + cos_lats * np.sin(dlon / 2) ** 2, 0, 1)
+    dist = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+    da_dlat = -0.5 * np.sin(dlat) - np.sin(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    da_dlon = -0.5 * cos_lats * np.sin(dlon)
+
+    a_span = a * (1 - a)
+    dd_da = np.where(a_span > 0, EARTH_RADIUS / np.sqrt(np.where(a_span > 0, a_span, 1)), 0)
+
+    gradient = np.stack([dd_da * da_dlat, dd_da * da_dlon], axis=-1) * (np.pi / 180)
+
+    return dist, gradient
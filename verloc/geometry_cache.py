@@ -0,0 +1,79 @@
+import os
+
+from shapely.prepared import prep
+
+# Natural Earth low resolution countries; None uses the copy shipped with geopandas,
+# VERLOC_WORLD_PATH or set_world_path() point to any other file geopandas can read
+world_path = os.environ.get('VERLOC_WORLD_PATH')
+
+# process-wide cache, filled lazily on first access. Worker processes forked after
+# preload() inherit the loaded geometries and never parse the file themselves.
+cache = {}
+
+def set_world_path(path):
+    global world_path
+    world_path = path
+    cache.clear()
+
+def set_world(world):
+    # inject an already loaded GeoDataFrame with name, continent and geometry columns
+    cache.clear()
+    cache['world'] = world
+
+def get_world():
+    if 'world' not in cache:
+        # geopandas is only needed to read the file
+        import geopandas as gpd
+
+        path = world_path
+        if path is None:
+            path = gpd.datasets.get_path('naturalearth_lowres')
+        cache['world'] = gpd.read_file(path)
+
+    return cache['world']
+
+def get_europe():
+    if 'europe' not in cache:
+        world = get_world()
+        cache['europe'] = world[world['continent'] == 'Europe']
+
+    return cache['europe']
+
+def get_countries():
+    # names of the European countries, in the order of the dataset
+    if 'countries' not in cache:
+        cache['countries'] = list(get_europe()['name'])
+
+    return cache['countries']
+
+def get_eu_polygons():
+    # country name -> geometry
+    if 'eu_polygons' not in cache:
+        europe = get_europe()
+        cache['eu_polygons'] = dict(zip(europe['name'], europe['geometry']))
+
+    return cache['eu_polygons']
+
+def get_prepared_eu_polygons():
+    # country name -> prepared geometry, for repeated contains() tests
+    if 'prepared_eu_polygons' not in cache:
+        cache['prepared_eu_polygons'] = {name: prep(geometry) for name, geometry in get_eu_polygons().items()}
+
+    return cache['prepared_eu_polygons']
+
+def get_prepared_world_geometries():
+    if 'prepared_world' not in cache:
+        cache['prepared_world'] = [prep(geometry) for geometry in get_world()['geometry']]
+
+    return cache['prepared_world']
+
+def preload():
+    # load and prepare everything, call before forking worker processes
+    get_countries()
+    get_prepared_eu_polygons()
+    get_prepared_world_geometries()
+
+    # the classifiers store themselves in this cache
+    from country_classifier import europe_classifier, world_classifier
+    europe_classifier()
+    world_classifier()
@@ -0,0 +1,104 @@
+import numpy as np
+
+from collections import OrderedDict
+
+import geometry_cache
+
+from geodesy import EARTH_RADIUS, one_to_many
+from localization import EARTH_BOUNDS
+from country_classifier import europe_classifier, world_classifier
+
+# meters per degree of latitude on the mean earth sphere
+METERS_PER_DEGREE = EARTH_RADIUS * 1000 * np.pi / 180
+
+class EqualAreaGrid():
+    """
+    Fixed grid over bounds with one point about every resolution meters: rows of constant
+    latitude, north to south, and in every row points west to east whose longitude spacing
+    grows with 1 / cos(lat), so all points cover about the same area. Country labels
+    (Europe, -1 elsewhere) and the land mask (any country) are computed once per grid.
+    """
+    def __init__(self, resolution, bounds=EARTH_BOUNDS):
+        (lat_min, lon_min), (lat_max, lon_max) = bounds
+        self.resolution = resolution
+        self.bounds = bounds
+
+        lat_step = resolution / METERS_PER_DEGREE
+        row_lats = lat_max - lat_step * np.arange(int(np.floor((lat_max - lat_min) / lat_step)) + 1)
+
+        lats = []
+        lons = []
+        for lat in row_lats:
+            lon_step = lat_step / np.cos(np.radians(lat))
+            row_lons = lon_min + lon_step * np.arange(int(np.floor((lon_max - lon_min) / lon_step)) + 1)
+            lats.append(np.full(len(row_lons), lat))
+            lons.append(row_lons)
+
+        self.points = np.stack([np.concatenate(lats), np.concatenate(lons)], axis=1)
+        self.cos_lats = np.cos(np.radians(self.points[:, 0]))
+        # ascending, for searchsorted
+        self.negative_lats = -self.points[:, 0]
+
+        self.labels = europe_classifier().classify(self.points)
+        self.land = world_classifier().classify(self.points) >= 0
+
+    def __len__(self):
+        return len(self.points)
+
+    def select_box(self, center, distance):
+        # indices of the points at most distance meters north/south and east/west of center
+        center = np.asarray(center, dtype=float)
+        lat_delta = distance / METERS_PER_DEGREE
+
+        # latitudes are sorted descending, only the rows within reach are tested
+        start = np.searchsorted(self.negative_lats, -(center[0] + lat_delta), side='left')
+        stop = np.searchsorted(self.negative_lats, -(center[0] - lat_delta), side='right')
+        rows = slice(start, stop)
+
+        lon_delta = lat_delta / self.cos_lats[rows]
+        within = np.abs(self.points[rows, 1] - center[1]) <= lon_delta
+
+        return rows.start + np.flatnonzero(within)
+
+    def select(self, center, distance):
+        # indices and distances in meters of the points at most distance meters from center
+        index = self.select_box(center, distance)
+        distances = one_to_many(center, self.points[index]) * 1000
+        within = distances <= distance
+
+        return index[within], distances[within]
+
+class GridCache():
+    """
+    Grids of several resolutions, built on first use and shared by all verifiers of the process.
+    Least recently used grids are evicted once all grids together hold more than max_points
+    points; the grid in use is always kept.
+    """
+    def __init__(self, max_points=2000000, bounds=EARTH_BOUNDS):
+        self.max_points = max_points
+        self.bounds = bounds
+        self.grids = OrderedDict()
+
+    def __len__(self):
+        return len(self.grids)
+
+    def get_num_points(self):
+        return sum(len(x) for x in self.grids.values())
+
+    def get_grid(self, resolution):
+        if resolution in self.grids:
+            self.grids.move_to_end(resolution)
+        else:
+            self.grids[resolution] = EqualAreaGrid(resolution, self.bounds)
+
+            while len(self.grids) > 1 and self.get_num_points() > self.max_points:
+                self.grids.popitem(last=False)
+
+        return self.grids[resolution]
+
+def grid_cache():
+    # the grids hold country labels, they are dropped together with the geometry they come from
+    if 'grid_cache' not in geometry_cache.cache:
+        geometry_cache.cache['grid_cache'] = GridCache()
+
+    return geometry_cache.cache['grid_cache']
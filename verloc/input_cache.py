@@ -0,0 +1,114 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# binary copies of the parsed inputs, one directory per source file and content
+CACHE_DIRECTORY = 'cache/inputs'
+
+# part of every cache directory name, raised whenever the layout of the cached arrays changes
+CACHE_FORMAT = 2
+
+def content_hash(path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+
+    return digest.hexdigest()[:16]
+
+def get_hash(source_path, directory=CACHE_DIRECTORY):
+    # the content hash is only recomputed when size or modification time of the source change
+    # one stamp per source file, copies with the same name in other directories have their own
+    stat = os.stat(source_path)
+    location = hashlib.sha1(os.path.abspath(source_path).encode()).hexdigest()[:16]
+    stamp = os.path.join(directory, '{}_{}.stamp.json'.format(os.path.basename(source_path), location))
+
+    try:
+        with open(stamp) as f:
+            stamped = json.load(f)
+        if stamped['size'] == stat.st_size and stamped['mtime_ns'] == stat.st_mtime_ns:
+            return stamped['hash']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    digest = content_hash(source_path)
+
+    os.makedirs(directory, exist_ok=True)
+    staging = '{}.{}.tmp'.format(stamp, os.getpid())
+    with open(staging, 'w') as f:
+        json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}, f)
+    os.replace(staging, stamp)
+
+    return digest
+
+def get_directory(source_path, directory=CACHE_DIRECTORY):
+    # e.g. cache/inputs/melted_propagation_25-06-2021_<hash>_v2, a changed file gets a new directory
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(directory, '{}_{}_v{}'.format(name, get_hash(source_path, directory), CACHE_FORMAT))
+
+def load(source_path, directory=CACHE_DIRECTORY):
+    # memory-maps all arrays cached for source_path, None if there are none yet
+    path = get_directory(source_path, directory)
+    if not os.path.isdir(path):
+        return None
+
+    return {os.path.splitext(x)[0]: np.load(os.path.join(path, x), mmap_mode='r', allow_pickle=False)
+            for x in sorted(os.listdir(path)) if x.endswith('.npy')}
+
+def save(source_path, arrays, directory=CACHE_DIRECTORY):
+    # writes into a temporary directory first, concurrent runs never see a partial cache
+    path = get_directory(source_path, directory)
+    os.makedirs(directory, exist_ok=True)
+
+    staging = tempfile.mkdtemp(dir=directory)
+    try:
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            if array.dtype.hasobject:
+                raise TypeError('Array {} has dtype object and cannot be cached, use a fixed-width dtype'.format(name))
+            np.save(os.path.join(staging, '{}.npy'.format(name)), array)
+
+        os.rename(staging, path)
+    except OSError:
+        # another process cached the same content in the meantime
+        if not os.path.isdir(path):
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    return load(source_path, directory)
+
+def frame_arrays(frame, prefix):
+    # one array per column, text columns as fixed-width unicode so they can be memory-mapped
+    arrays = {'{}columns'.format(prefix): np.array(list(frame.columns), dtype=str)}
+    for column in frame.columns:
+        values = frame[column].to_numpy()
+        if values.dtype.kind not in 'biuf':
+            # missing text is kept as a mask, astype(str) alone would turn it into 'nan'
+            missing = pd.isna(frame[column]).to_numpy()
+            if missing.any():
+                arrays['{}{}_missing'.format(prefix, column)] = missing
+            values = np.where(missing, '', values).astype(str)
+        arrays['{}{}'.format(prefix, column)] = values
+
+    return arrays
+
+def array_frame(arrays, prefix):
+    # inverse of frame_arrays, the columns stay backed by the cached arrays until they are written
+    columns = [str(x) for x in arrays['{}columns'.format(prefix)]]
+
+    data = {}
+    for column in columns:
+        values = arrays['{}{}'.format(prefix, column)]
+        missing = arrays.get('{}{}_missing'.format(prefix, column))
+        if missing is not None:
+            values = values.astype(object)
+            values[missing] = np.nan
+        data[column] = values
+
+    return pd.DataFrame(data, columns=columns, copy=False)
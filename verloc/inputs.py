@@ -1,7 +1,8 @@
+import numpy as np
 import pandas as pd
 from scipy import constants
 
-from random import shuffle
+import input_cache
 
 class Node():
     def __init__(self, node_id, node_key, ip_address, lat, lon, country_code, country):
@@ -43,6 +44,8 @@ class Node():
         return self.country_code
     def get_node_id(self):
         return self.node_id
+    def get_identity_key(self):
+        return self.node_key
     def get_my_measurements(self):
         return self.my_measurements
     def get_their_measurements(self):
@@ -52,6 +55,189 @@ class Node():
     def get_schedule(self):
         return self.schedule
 
+class RaggedArray():
+    # CSR style storage of per-node lists: the values of row i are values[offsets[i]:offsets[i+1]]
+    def __init__(self, offsets, values):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.values = np.asarray(values)
+
+    @classmethod
+    def empty(cls, num_rows, dtype=float, width=None):
+        shape = (0,) if width is None else (0, width)
+        return cls(np.zeros(num_rows + 1, dtype=np.int64), np.empty(shape, dtype=dtype))
+
+    @classmethod
+    def from_lists(cls, lists, dtype=float, width=None):
+        lengths = np.array([len(x) for x in lists], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+        shape = (0,) if width is None else (0, width)
+        parts = [np.asarray(x, dtype=dtype).reshape(shape[:0] + (-1,) + shape[1:]) for x in lists if len(x) > 0]
+        values = np.concatenate(parts) if len(parts) > 0 else np.empty(shape, dtype=dtype)
+
+        return cls(offsets, values)
+
+    @classmethod
+    def from_mask(cls, matrix, mask):
+        # keeps the masked entries of a padded (rows, columns, ...) matrix row by row
+        offsets = np.concatenate([[0], np.cumsum(mask.sum(axis=1))])
+        return cls(offsets, matrix[mask])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.values[self.offsets[row]:self.offsets[row + 1]]
+
+    def get_lengths(self):
+        return np.diff(self.offsets)
+
+    def get_rows(self):
+        # row index of every value
+        return np.repeat(np.arange(len(self)), self.get_lengths())
+
+class NodeView():
+    # one row of a NodeTable with the getter API of Node, ragged data is returned as array slices
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    @property
+    def node_id(self):
+        return self.table.node_ids[self.row].item()
+    @property
+    def node_key(self):
+        return self.table.node_keys[self.row].item()
+    @property
+    def ip_address(self):
+        return self.table.ip_addresses[self.row].item()
+    @property
+    def location(self):
+        return tuple(self.table.locations[self.row].tolist())
+    @property
+    def country_code(self):
+        return self.table.country_codes[self.row].item()
+    @property
+    def country(self):
+        return self.table.countries[self.row].item()
+
+    def assign_location_estimate(self, loc_estimate):
+        self.table.location_estimates[self.row] = loc_estimate
+
+    def get_available_references(self):
+        return self.table.available_references[self.row]
+    def get_ref_locations(self):
+        return self.table.reference_locations[self.row]
+    def get_location(self):
+        return self.location
+    def get_country(self):
+        return self.country_code
+    def get_node_id(self):
+        return self.node_id
+    def get_identity_key(self):
+        return self.node_key
+    def get_my_measurements(self):
+        return self.table.my_measurements[self.row]
+    def get_their_measurements(self):
+        return self.table.their_measurements[self.row]
+    def get_location_estimate(self):
+        return self.table.location_estimates[self.row]
+    def get_schedule(self):
+        return self.table.schedule[self.row]
+
+class NodeTable():
+    """
+    Columnar storage of a network: one array per node attribute and RaggedArrays for the
+    per-node lists. my_measurements, their_measurements and reference_locations share the
+    same offsets and only hold references with a measurement in both directions.
+    Iterating yields node ids, table[node_id] returns a NodeView.
+    """
+    def __init__(self, node_ids, node_keys, ip_addresses, lats, lons, country_codes, countries):
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.node_keys = np.asarray([str(x) for x in node_keys])
+        self.ip_addresses = np.asarray([str(x) for x in ip_addresses])
+        self.locations = np.stack([np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)], axis=1).reshape(-1, 2)
+        self.country_codes = np.asarray(country_codes)
+        self.countries = np.asarray(countries)
+        self.location_estimates = np.full(self.locations.shape, np.nan)
+
+        self.rows = {node_id: row for row, node_id in enumerate(self.node_ids.tolist())}
+
+        num_nodes = len(self.node_ids)
+        self.available_references = RaggedArray.empty(num_nodes, dtype=np.int64)
+        self.schedule = RaggedArray.empty(num_nodes, dtype=np.int64)
+        self.my_measurements = RaggedArray.empty(num_nodes)
+        self.their_measurements = RaggedArray.empty(num_nodes)
+        self.reference_locations = RaggedArray.empty(num_nodes, width=2)
+
+    @classmethod
+    def from_network(cls, network):
+        nodes = [network[x] for x in network]
+        table = cls([x.get_node_id() for x in nodes], [x.node_key for x in nodes], [x.ip_address for x in nodes],
+            [x.get_location()[0] for x in nodes], [x.get_location()[1] for x in nodes],
+            [x.country_code for x in nodes], [x.country for x in nodes])
+
+        table.available_references = RaggedArray.from_lists([x.get_available_references() for x in nodes], dtype=np.int64)
+        table.schedule = RaggedArray.from_lists([x.get_schedule() for x in nodes], dtype=np.int64)
+        table.my_measurements = RaggedArray.from_lists([x.get_my_measurements() for x in nodes])
+        table.their_measurements = RaggedArray.from_lists([x.get_their_measurements() for x in nodes])
+        table.reference_locations = RaggedArray.from_lists([x.get_ref_locations() for x in nodes], width=2)
+
+        return table
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __iter__(self):
+        return iter(self.node_ids.tolist())
+
+    def __contains__(self, node_id):
+        return node_id in self.rows
+
+    def __getitem__(self, node_id):
+        return NodeView(self, self.rows[node_id])
+
+    def view(self, row):
+        return NodeView(self, row)
+
+    def get_rows(self, node_ids):
+        # table row of every node id, -1 for unknown nodes
+        return np.array([self.rows.get(x, -1) for x in node_ids], dtype=np.int64)
+
+    def set_available_references(self, available_references):
+        # node id -> reference ids, e.g. the result of TimingData.define_available_references
+        empty = np.empty(0, dtype=np.int64)
+        self.available_references = RaggedArray.from_lists([available_references.get(x, empty) for x in self], dtype=np.int64)
+
+    def set_measurements(self, my_measurements, their_measurements, reference_locations, mask):
+        # padded (nodes, references) times and (nodes, references, 2) locations, mask marks the valid entries
+        self.my_measurements = RaggedArray.from_mask(np.asarray(my_measurements, dtype=float), mask)
+        self.their_measurements = RaggedArray.from_mask(np.asarray(their_measurements, dtype=float), mask)
+        self.reference_locations = RaggedArray.from_mask(np.asarray(reference_locations, dtype=float), mask)
+
+    def set_schedule(self, schedule, timing_measurements):
+        # bulk version of assign_timings_to_network and add_reference_data_to_nodes
+        self.schedule = RaggedArray.from_lists([schedule.get(x, []) for x in self], dtype=np.int64)
+
+        node_rows = self.schedule.get_rows()
+        ref_rows = self.get_rows(self.schedule.values.tolist())
+
+        timing_rows = timing_measurements.get_rows(self.node_ids)
+        node_timing = timing_rows[node_rows]
+        ref_timing = np.where(ref_rows >= 0, timing_rows[ref_rows], -1)
+
+        valid = (node_timing >= 0) & (ref_timing >= 0)
+        my_rtt = timing_measurements.my_rtt[node_timing[valid], ref_timing[valid]]
+        their_rtt = timing_measurements.their_rtt[node_timing[valid], ref_timing[valid]]
+        measured = np.isfinite(my_rtt) & np.isfinite(their_rtt)
+
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(node_rows[valid][measured], minlength=len(self)))])
+        self.my_measurements = RaggedArray(offsets, my_rtt[measured])
+        self.their_measurements = RaggedArray(offsets, their_rtt[measured])
+        self.reference_locations = RaggedArray(offsets, self.locations[ref_rows[valid][measured]])
+
 class Measurement():
     def __init__(self, from_node, to_node, timings):
         self.from_node = from_node
@@ -62,41 +248,59 @@ class Measurement():
         return min(self.raw_timings)
 
 class Schedule():
-    def __init__(self, num_references, network):
-        # initialize empty reference dict once
-        # otherwise we'd overwrite references with empty lists later
-        references = {}
-        for node in network:
-            references[node] = []
-
-        # use the list of ids in our network as search space for random references
-        for node_id in network:
+    def __init__(self, num_references, network, seed=None):
+        # seeded generator, the same seed and network always give the same schedule
+        rng = np.random.default_rng(seed)
+
+        # work on row indices, nodes at the same claimed location share a location code
+        node_ids = np.fromiter(network.keys(), dtype=np.int64, count=len(network))
+        id_order = np.argsort(node_ids)
+        sorted_ids = node_ids[id_order]
+
+        location_codes = {}
+        node_locations = np.array([location_codes.setdefault(network[x].get_location(), len(location_codes)) for x in network], dtype=np.int64)
+
+        # initialize empty references once
+        # otherwise we'd overwrite references that were added symmetrically later
+        references = [[] for _ in node_ids]
+        members = [set() for _ in node_ids]
+        ref_counts = np.zeros(len(node_ids), dtype=np.int64)
+        is_reference = np.zeros(len(node_ids), dtype=bool)
+
+        for row, node_id in enumerate(network):
             node = network[node_id]
-            
+
+            # make sure we cannot receive ourself or a reference at our own location
+            available = np.asarray(node.get_available_references(), dtype=np.int64)
+            positions = np.minimum(np.searchsorted(sorted_ids, available), len(sorted_ids) - 1)
+            candidates = id_order[positions[sorted_ids[positions] == available]]
+            candidates = candidates[(candidates != row) & (node_locations[candidates] != node_locations[row])]
+
+            # references we already have, e.g. from symmetric measurements of earlier nodes
+            is_reference[references[row]] = True
+            chosen = is_reference[candidates]
+            is_reference[references[row]] = False
+
             # ---------------------------------------------------------------------------
             # check how many more references we need, can vary between nodes
-            missing_references = num_references - len(references[node_id])
-
             iter_cnt = 0
-            while missing_references > 0:
-                missing_references = num_references - len(references[node_id])
-                
-                # make sure we cannot receive references we already have or ourself
-                filtered_refs = []
-                locations = []
-                for candidate in node.get_available_references():
-                    if candidate not in references[node_id] and candidate != node_id:
-                        ref_loc = network[candidate].get_location()
-                        if ref_loc not in locations and ref_loc != node.get_location():
-                            filtered_refs.append(candidate)
-                            locations.append(ref_loc)
-
+            while ref_counts[row] < num_references and iter_cnt < 10:
                 iter_cnt = iter_cnt + 1
-                if iter_cnt > 10:
+
+                # only one candidate per location in each round
+                open_candidates = np.flatnonzero(~chosen)
+                _, first_at_location = np.unique(node_locations[candidates[open_candidates]], return_index=True)
+                open_candidates = open_candidates[np.sort(first_at_location)]
+                if len(open_candidates) == 0:
                     break
 
-                shuffle(filtered_refs)
-                references[node_id].extend(filtered_refs[:missing_references])
+                missing_references = num_references - ref_counts[row]
+                picked = rng.choice(open_candidates, size=min(missing_references, len(open_candidates)), replace=False)
+
+                chosen[picked] = True
+                references[row].extend(candidates[picked].tolist())
+                members[row].update(candidates[picked].tolist())
+                ref_counts[row] = len(references[row])
 
             """
             We do symmetric measurements, so we can assume that if a measures b, then b measures a.
@@ -107,15 +311,16 @@ class Schedule():
             - 1 has references 2,5,10
             - We add 1 to the reference sets of 2, 5, 10
             """
-            for r in references[node_id]:
-                try:
-                    if num_references - len(references[r]) > 0 and node_id not in references[r]:
-                        references[r].append(node_id)
-                except Exception as e:
-                    print (e)
+            my_refs = np.array(references[row], dtype=np.int64)
+            my_refs = my_refs[ref_counts[my_refs] < num_references]
+            my_refs = my_refs[np.array([row not in members[r] for r in my_refs.tolist()], dtype=bool)]
 
-        self.schedule = references
+            ref_counts[my_refs] += 1
+            for r in my_refs.tolist():
+                references[r].append(row)
+                members[r].add(row)
 
+        self.schedule = {node_id: node_ids[references[row]].tolist() for row, node_id in enumerate(network)}
 
     def get_schedule(self):
         return self.schedule
@@ -134,58 +339,133 @@ class Schedule():
             network[node].add_ref_locations(ref_locs)
 
 class TimingData():
-    def __init__(self, timestamp):
+    def __init__(self, timestamp, propagation=None, cache_directory=input_cache.CACHE_DIRECTORY):
         # uses the parsed real-world measurements
 
-        # uses today's measurements
-        # self.propagation = pd.read_csv('../parser/static_data/melted_propagation_{}.csv'.format(timestamp))
+        if propagation is None:
+            # uses today's measurements
+            # self.load('../parser/static_data/melted_propagation_{}.csv'.format(timestamp), cache_directory)
+
+            # used in the experimental eval of the USENIX'22 paper
+            self.load('../parser/static_data/melted_propagation_25-06-2021.csv', cache_directory)
+        else:
+            self.set_propagation(propagation)
+
+    def set_propagation(self, propagation):
+        self.propagation = propagation
 
-        # used in the experimental eval of the USENIX'22 paper
-        self.propagation = pd.read_csv('../parser/static_data/melted_propagation_25-06-2021.csv')
-        
         self.propagation['distances'] = self.propagation['distances'] / 1000
         self.propagation['speeds'] = self.propagation['speeds'] / 1000
 
+        self.build_pair_index()
+
+    def load(self, path, cache_directory=input_cache.CACHE_DIRECTORY):
+        """
+        Reads the melted propagation table at path. The scaled table and the RTT matrices are
+        cached in binary form next to the run (keyed by file name and content hash) and
+        memory-mapped on later runs; cache_directory None always parses the CSV.
+        """
+        arrays = input_cache.load(path, cache_directory) if cache_directory is not None else None
+
+        if arrays is None:
+            self.set_propagation(pd.read_csv(path))
+
+            if cache_directory is not None:
+                arrays = input_cache.frame_arrays(self.propagation, 'propagation_')
+                arrays.update(node_ids=self.node_ids, my_rtt=self.my_rtt, their_rtt=self.their_rtt)
+                input_cache.save(path, arrays, cache_directory)
+        else:
+            self.propagation = input_cache.array_frame(arrays, 'propagation_')
+            self.node_ids = arrays['node_ids']
+            self.node_index = {node_id: row for row, node_id in enumerate(self.node_ids.tolist())}
+            self.my_rtt = arrays['my_rtt']
+            self.their_rtt = arrays['their_rtt']
+
+    def build_pair_index(self):
+        """
+        Dense RTT matrices indexed by node row, built once for all pairs.
+
+        my_rtt[i, j] is the time node i measures towards node j, their_rtt[i, j] the time
+        node j measures at the same time. Rows where i is the FromIndex take precedence,
+        the reverse direction only fills pairs that were never measured from i.
+        """
+        pairs = self.propagation.drop_duplicates(subset=['FromIndex', 'ToIndex'], keep='first')
+
+        self.node_ids = np.unique(np.concatenate([pairs['FromIndex'].values, pairs['ToIndex'].values]))
+        self.node_index = {node_id: row for row, node_id in enumerate(self.node_ids.tolist())}
+
+        from_rows = np.searchsorted(self.node_ids, pairs['FromIndex'].values)
+        to_rows = np.searchsorted(self.node_ids, pairs['ToIndex'].values)
+        time_from_to = pairs['TimeFromTo'].values.astype(float)
+        time_to_from = pairs['TimeToFrom'].values.astype(float)
+
+        num_nodes = len(self.node_ids)
+        self.my_rtt = np.full((num_nodes, num_nodes), np.nan)
+        self.their_rtt = np.full((num_nodes, num_nodes), np.nan)
+
+        # measured from the node itself
+        self.my_rtt[from_rows, to_rows] = time_from_to
+        self.their_rtt[from_rows, to_rows] = time_to_from
+
+        # measured by the reference, only where the node has no own entry
+        missing = np.isnan(self.my_rtt[to_rows, from_rows])
+        self.my_rtt[to_rows[missing], from_rows[missing]] = time_to_from[missing]
+        self.their_rtt[to_rows[missing], from_rows[missing]] = time_from_to[missing]
+
+    def get_rows(self, node_ids):
+        # row of every node in the RTT matrices, -1 for nodes without measurements
+        return np.array([self.node_index.get(x, -1) for x in node_ids], dtype=np.int64)
+
+    def get_pair_timings(self, node, ref):
+        # returns (my_rtt, their_rtt) or (None, None) if the pair was never measured
+        try:
+            i = self.node_index[node]
+            j = self.node_index[ref]
+        except KeyError:
+            return None, None
+
+        my_rtt = self.my_rtt[i, j]
+        their_rtt = self.their_rtt[i, j]
+        if np.isnan(my_rtt) or np.isnan(their_rtt):
+            return None, None
+
+        return my_rtt, their_rtt
+
     def define_available_references(self, network):
-        for node_id in network:
-            node = network[node_id]
+        # one pass over the table: every node can use the nodes it measured towards
+        node_ids = np.fromiter(network.keys(), dtype=np.int64, count=len(network))
+        in_network = self.propagation[self.propagation['FromIndex'].isin(node_ids) & self.propagation['ToIndex'].isin(node_ids)]
+        grouped = in_network.groupby('FromIndex')['ToIndex'].unique()
 
-            prop_subset_from = list(self.propagation[self.propagation['FromIndex'] == node.get_node_id()]['ToIndex'])
-            prop_subset_to = list(self.propagation[self.propagation['ToIndex'] == node.get_node_id()]['FromIndex'])
+        available_references = {}
+        for node_id in network:
+            if node_id in grouped.index:
+                refs = np.sort(grouped[node_id].astype(np.int64))
+            else:
+                refs = np.empty(0, dtype=np.int64)
 
-            available_references = prop_subset_from + list(set(prop_subset_from) - set(prop_subset_to))
-            available_references = [x for x in available_references if x in network.keys()]
+            network[node_id].set_available_references(refs)
+            available_references[node_id] = refs
 
-            node.set_available_references(list(set(available_references)))
+        return available_references
 
     def assign_timings_to_network(self, schedule, network):
         for node in schedule:
             for ref in schedule[node]:
+                my_rtt, their_rtt = self.get_pair_timings(node, ref)
 
-                my_rtt = None
-                their_rtt = None
-                try:
-                    my_rtt = self.propagation[(self.propagation['FromIndex'] == node) & (self.propagation['ToIndex'] == ref)].iloc[0]['TimeFromTo']
-                except:
-                    my_rtt = self.propagation[(self.propagation['ToIndex'] == node) & (self.propagation['FromIndex'] == ref)].iloc[0]['TimeToFrom']
-                    
-                try:
-                    their_rtt = self.propagation[(self.propagation['FromIndex'] == node) & (self.propagation['ToIndex'] == ref)].iloc[0]['TimeToFrom']
-                except:
-                    their_rtt = self.propagation[(self.propagation['ToIndex'] == node) & (self.propagation['FromIndex'] == ref)].iloc[0]['TimeFromTo']
-                    
                 if my_rtt is not None and their_rtt is not None:
                     network[node].add_measurements(my_rtt, their_rtt)
 
 class Network():
-    def __init__(self, timestamp, num_nodes):
+    def __init__(self, timestamp, num_nodes, cache_directory=input_cache.CACHE_DIRECTORY):
         # uses the parsed real-world measurements
 
         # uses today's measurements
-        # node_locations = pd.read_csv('../parser/static_data/eu_node_identities_{}.csv'.format(timestamp))
+        # node_locations = self.read_identities('../parser/static_data/eu_node_identities_{}.csv'.format(timestamp), cache_directory)
 
         # used in the experimental eval of the USENIX'22 paper
-        node_locations = pd.read_csv('../parser/static_data/eu_node_identities_25-06-2021.csv')
+        node_locations = self.read_identities('../parser/static_data/eu_node_identities_25-06-2021.csv', cache_directory)
 
         self.lats = list(node_locations['lat'])
         self.lons = list(node_locations['lon'])
@@ -202,6 +482,24 @@ class Network():
 
         self.network = network
 
+    @staticmethod
+    def read_identities(path, cache_directory=input_cache.CACHE_DIRECTORY):
+        # node identities as a DataFrame, memory-mapped from the binary cache once it exists
+        arrays = input_cache.load(path, cache_directory) if cache_directory is not None else None
+
+        if arrays is None:
+            node_locations = pd.read_csv(path)
+
+            if cache_directory is not None:
+                input_cache.save(path, input_cache.frame_arrays(node_locations, 'identities_'), cache_directory)
+
+            return node_locations
+
+        return input_cache.array_frame(arrays, 'identities_')
+
     def get_network(self):
         return self.network
+
+    def get_node_table(self):
+        return NodeTable.from_network(self.network)
         
@@ -3,7 +3,7 @@ from math import sqrt
 
 import time
 
-from vincenty import vincenty
+from geodesy import one_to_many, haversine_gradient
 
 from colorama import Fore
 from shapely import geometry
@@ -15,12 +15,15 @@ from scipy.optimize import NonlinearConstraint
 
 from propagation import Propagation
 
+# search space of the localization, (lat, lon) of the south-west and north-east corner
+# limited to Europe because we focus on European nodes
+EARTH_BOUNDS = ((27.6375, -18.1706), (60.8444, 40.1797))
+
 class Localizer():
     def __init__(self, my_times, their_times, reference_locations):
         # self.earth_bounds = Bounds([-90, -180], [90, 180])
 
-        # limit the search space to Europe because we focus on Eiropean nodes
-        self.earth_bounds = Bounds([27.6375, -18.1706],[60.8444, 40.1797])
+        self.earth_bounds = Bounds(*EARTH_BOUNDS)
 
         # all of the following are static items that stay the same during the optimization
         self.my_times = my_times
@@ -29,7 +32,11 @@ class Localizer():
 
         # will be set later on
         self.measured_distances = None
-        self.mean_prop_time = None
+
+        # constants of the objective, computed once per node instead of once per evaluation
+        self.prop_model = Propagation('paper')
+        self.mean_prop_time = self.calc_mean_prop_time()
+        self.error_weights = self.calc_error_weights()
 
     def prepare_initial_guess(self):
         try:
@@ -49,7 +56,7 @@ class Localizer():
 
         # record timings to measure the overhead
         start = time.time()
-        location_estimate = minimize(self.error_rmse, x0=initial_guess, bounds=self.earth_bounds)
+        location_estimate = minimize(self.error_rmse_and_gradient, x0=initial_guess, jac=True, bounds=self.earth_bounds)
         end = time.time()
         duration = end-start
 
@@ -59,32 +66,33 @@ class Localizer():
         return np.power(timing, sqrt(1))
 
     def calc_estimate_distances(self, location_estimate):
-        estimate_distances = []
-        for ref in self.reference_locations:
-            # distance in km, WGS 84 reference ellipsoid
-            dist = vincenty(location_estimate, ref) * 1000
-            if dist != None:
-                estimate_distances.append(dist)
-            else:
-                print ('Problem in calc_estimate_distances:', location_estimate, ref, dist)
+        # distance in m, WGS 84 reference ellipsoid
+        estimate_distances = one_to_many((location_estimate[0], location_estimate[1]), self.reference_locations) * 1000
 
-        return np.array(estimate_distances)
+        if np.isnan(estimate_distances).any():
+            print ('Problem in calc_estimate_distances:', location_estimate, estimate_distances)
+            estimate_distances = estimate_distances[~np.isnan(estimate_distances)]
+
+        return estimate_distances
 
     def calc_mean_prop_time(self):
         return np.add(self.my_times, self.their_times) / 2
-        
 
-    def get_distance_error(self, location_estimate):
-        prop_model = Propagation('paper')
+    def calc_error_weights(self):
+        # shorter measurements get a higher weight, L1 normalized
+        try:
+            inverse_times = 1 / self.calc_power(self.mean_prop_time)
+            return inverse_times / norm(inverse_times, 1)
+        except Exception as e:
+            print (Fore.RED + 'ERROR {}: timing in the wrong format: timing is {}'.format(e, type(self.mean_prop_time)))
+            return None
 
+    def get_distance_error(self, location_estimate):
         # distance between current estimate and all reference locations
         estimate_distances = self.calc_estimate_distances(location_estimate)
 
         # apply propagation function to estimated distances
-        estimate_speeds = np.array([prop_model.get_time(x) for x in estimate_distances])
-
-        # average measured time of outgoing and incoming measurements
-        self.mean_prop_time = self.calc_mean_prop_time()
+        estimate_speeds = self.prop_model.get_time(estimate_distances)
 
         self.measured_distances = self.mean_prop_time * estimate_speeds
 
@@ -105,9 +113,29 @@ class Localizer():
 
         # base_error and mean_prop_time need to be np.ndarray
         try:
-            error = base_error * ( (1 / self.calc_power(self.mean_prop_time)) / norm( (1 / self.calc_power(self.mean_prop_time)), 1))
+            error = base_error * self.error_weights
             rmse = sqrt(np.mean(np.power(error, 2)))
         except Exception as e:
             print (Fore.RED + 'ERROR {}: error or timing in the wrong format: error is {}, timing is {}'.format(e, type(base_error), type(self.mean_prop_time)))
 
         return rmse
+
+    def error_rmse_and_gradient(self, location_estimate):
+        # same objective as error_rmse on a sphere, returns the value and its gradient for jac=True
+        estimate_distances, distance_gradient = haversine_gradient(location_estimate, self.reference_locations)
+        estimate_distances = estimate_distances * 1000
+        distance_gradient = distance_gradient * 1000
+
+        estimate_speeds = self.prop_model.get_time(estimate_distances)
+        speed_slopes = self.prop_model.get_slope(estimate_distances)
+
+        error = (estimate_distances - self.mean_prop_time * estimate_speeds) * self.error_weights
+        rmse = sqrt(np.mean(np.power(error, 2)))
+        if rmse == 0:
+            return rmse, np.zeros(2)
+
+        # d error / d distance, chained with d distance / d (lat, lon)
+        error_slopes = (1 - self.mean_prop_time * speed_slopes) * self.error_weights
+        gradient = np.sum((error * error_slopes)[:, None] * distance_gradient, axis=0) / (len(error) * rmse)
+
+        return rmse, gradient
@@ -1,26 +1,26 @@
-import reverse_geocode
+import os
 import numpy as np
 import pandas as pd
-import seaborn as sns
-import geopandas as gpd
-import matplotlib.pyplot as plt
-
-from shapely.geometry import Point
-from mpl_toolkits.axes_grid1 import make_axes_locatable
-from matplotlib import cm
-from vincenty import vincenty
+
+from geodesy import distances
 from statistics import median
 
+from country_lookup import country_lookup
+
 class LocalizationPerformance():
-    def __init__(self, physical_locations, estimated_locations, loc_computations, confidence_results, process_id):
+    def __init__(self, physical_locations, estimated_locations, loc_computations, confidence_results, process_id, sink=None, lookup=None):
         self.physical_locations = physical_locations
         self.estimated_locations = estimated_locations
         self.confidence_scores = confidence_results
         self.comutation_timing = loc_computations
         self.process_id = process_id
+        # optional results.ResultSink, otherwise every process writes its own file to mp/
+        self.sink = sink
 
-        self.physical_countries = reverse_geocode.search(self.physical_locations)
-        self.estimated_countries = reverse_geocode.search(self.estimated_locations)
+        # country indices of the verification classifier, -1 outside of all countries
+        self.lookup = lookup if lookup is not None else country_lookup()
+        self.physical_countries = self.lookup.lookup(self.physical_locations)
+        self.estimated_countries = self.lookup.lookup(self.estimated_locations)
 
     def get_location_error(self):
         return self.location_error
@@ -37,13 +37,14 @@ class LocalizationPerformance():
         node_ids = list(self.confidence_scores['node_id'])
         identity_keys = list(self.confidence_scores['identity_key'])
 
-        for idx, phy in enumerate(self.physical_locations):
-            est = self.estimated_locations[idx]
-            try:
-                err = vincenty(phy, est)
-            except:
-                err = -1
+        # distances in km between every physical location and its estimate, -1 if it failed
+        try:
+            errors = distances(self.physical_locations, self.estimated_locations)
+            errors[np.isnan(errors)] = -1
+        except Exception:
+            errors = [-1] * len(self.physical_locations)
 
+        for idx, err in enumerate(errors):
             loc_error['identity_key'].append(identity_keys[idx])
             loc_error['node_id'].append(node_ids[idx])
 
@@ -55,106 +56,44 @@ class LocalizationPerformance():
 
         self.location_error = pd.DataFrame.from_dict(loc_error)
 
-        # TODO file name currently focuses on r=40 and should be adjusted if changes to the params are made
-        self.location_error.to_csv('mp/{}_location_error_r40.csv'.format(self.process_id), sep=',', index=False)
+        if self.sink is not None:
+            self.sink.add('location_error', self.location_error.assign(process_id=self.process_id))
+        else:
+            # TODO file name currently focuses on r=40 and should be adjusted if changes to the params are made
+            os.makedirs('mp', exist_ok=True)
+            self.location_error.to_csv('mp/{}_location_error_r40.csv'.format(self.process_id), sep=',', index=False)
 
     def write_stats(self):
         self.compute_location_error()
         self.compare_countries()
 
     def compare_countries(self):
-        country_comparison = []
-        for idx, elem in enumerate(self.physical_countries):
-            phy_cc = elem['country_code']
-            est_cc = self.estimated_countries[idx]['country_code']
-
-            if phy_cc == est_cc:
-                country_comparison.append(1)
-            else:
-                country_comparison.append(0)
+        # a location that cannot be placed in a country (-1) never counts as a match
+        placed = (self.physical_countries >= 0) & (self.estimated_countries >= 0)
+        country_comparison = placed & (self.physical_countries == self.estimated_countries)
 
-        self.cc_accuracy = sum(country_comparison) / len(country_comparison)
+        self.cc_accuracy = np.mean(country_comparison)
 
 
+    # plots live in reporting, imported on demand to keep matplotlib and seaborn off the compute path
     def plot_location_error(self):
-        sns.set_theme()
-
-        fig, ax = plt.subplots(1, 1, figsize=(10, 6))
-        ax = sns.histplot(self.location_error['location_error'], kde=True, ax=ax)
-        plt.savefig('../visualization/location_error.pdf')
+        import reporting
+        reporting.plot_location_error(self.location_error)
 
     def plot_localization(self):
-        real_locations = {'geometry': []}
-        esti_locations = {'geometry': []}
-
-        for idx, phy in enumerate(self.physical_locations):
-            est = self.estimated_locations[idx]
-            try:
-                real_locations['geometry'].append(Point(float(phy[1]), float(phy[0])))
-                esti_locations['geometry'].append(Point(float(est[1]), float(est[0])))
-
-            except:
-                pass
-
-        phy_points = gpd.GeoDataFrame(real_locations, geometry=real_locations['geometry'])
-        est_points = gpd.GeoDataFrame(esti_locations, geometry=esti_locations['geometry'])
-
-        world = gpd.read_file(gpd.datasets.get_path('naturalearth_lowres'))
-
-        fig, ax = plt.subplots(1, 1, figsize=(10, 10))
-
-        world.boundary.plot(ax=ax, edgecolor='slategray', linewidth=1)
-        est_points.plot(ax=ax, color='xkcd:crimson', markersize=10, alpha=0.4)
-        phy_points.plot(ax=ax, color='black', markersize=10, alpha=0.4)
-
-        # [27.6375, -18.1706],[60.8444, 40.1797]
-        # zoom in on Europe
-        # TODO automatic focus
-        ax.set_xlim([-18.1706, 40.1797])
-        ax.set_ylim([27.6375, 60.8444])
-
-        plt.savefig('../visualization/estimates.pdf')
+        import reporting
+        reporting.plot_localization(self.physical_locations, self.estimated_locations)
 
     def plot_confidences(self):
-        sns.set_theme()
-
-        # non_confident = loc_error_df[loc_error_df['confidence'] < 0.2]
-        # yes_confident = loc_error_df[loc_error_df['confidence'] >= 0.2]
-
-        self.confidence_scores['fast'] = 1 - self.confidence_scores['fast']
-        self.confidence_scores['slow'] = 1 - self.confidence_scores['slow']
-
-        melted_confidences = pd.melt(self.confidence_scores, id_vars=['node'], value_vars=['score', 'fast', 'slow'])
-        
-        fig, ax = plt.subplots(1, 1, figsize=(10, 6))
-        sns.displot(data=melted_confidences, x="value", hue="variable", kind="kde")
-        plt.savefig('../visualization/confidence_comparison.pdf')
-
-        fig, ax = plt.subplots(1, 1, figsize=(10, 6))
-        sns.scatterplot(data=self.location_error, x="location_error", y="confidence")
-        plt.savefig('../visualization/location_confidence.pdf')
-
-        fig, ax = plt.subplots(1, 1, figsize=(10, 6))
-        ax = sns.histplot(self.location_error['confidence'], kde=True, ax=ax)
-        # plt.axvline([0.1, 0.1], [0,100])
-        # plt.axvline([0.2, 0.2], [0,100])
-        # plt.axvline([0.3, 0.3], [0,100])
-        plt.savefig('../visualization/confidences.pdf')
-
-
-        threshold = 0.06
-        self.location_error['decision'] = 'reject'
-        self.location_error.loc[(self.location_error['confidence'] >= threshold), 'decision'] = 'accept'
-
-        fig, ax = plt.subplots(1, 1, figsize=(10, 6))
-        sns.displot(data=self.location_error, x="location_error", hue="decision", kind="kde")
-        plt.savefig('../visualization/confidence_decision.pdf')
+        import reporting
+        reporting.plot_confidences(self.confidence_scores, self.location_error)
 
 class VerificationPerformance():
-    def __init__(self, verification_results, physical_locations, process_id):
+    def __init__(self, verification_results, physical_locations, process_id, sink=None):
         self.verification_results = verification_results
         self.physical_locations = physical_locations
         self.process_id = process_id
+        self.sink = sink
         self.physical_countries = physical_locations
 
     def prepare_summary(self):
@@ -183,36 +122,16 @@ class VerificationPerformance():
         try:
             self.cc_accuracy = sum(country_comparison) / len(country_comparison)
             self.ver_results = pd.DataFrame.from_dict(ver_results)
-            self.ver_results.to_csv('mp/{}_verification_fixed.csv'.format(self.process_id), sep=',', index=False)
-            print ('mp/{}_verification_fixed.csv'.format(self.process_id))
+            if self.sink is not None:
+                self.sink.add('verification', self.ver_results.assign(process_id=self.process_id))
+            else:
+                os.makedirs('mp', exist_ok=True)
+                self.ver_results.to_csv('mp/{}_verification_fixed.csv'.format(self.process_id), sep=',', index=False)
+                print ('mp/{}_verification_fixed.csv'.format(self.process_id))
         except:
             pass
 
     # must be called in node repetition
     def plot_map(self, cropped_grid, target_location, index):
-
-        grid = {'geometry': []}
-        weights = []
-        for elem in cropped_grid:
-            grid['geometry'].append(Point(elem[1], elem[0]))
-            weights.append(elem[2])
-
-        grid_points = gpd.GeoDataFrame(grid, geometry=grid['geometry'])
-        grid_points['weight'] = weights
-
-        target = {'geometry': [Point(target_location[1], target_location[0])]}
-        target_point = gpd.GeoDataFrame(target, geometry=target['geometry'])
-
-        fig, ax = plt.subplots(1, 1, figsize=(10, 10))
-
-        world = gpd.read_file(gpd.datasets.get_path('naturalearth_lowres'))
-
-        world.boundary.plot(ax=ax, edgecolor='slategray', linewidth=1)
-        grid_points.plot(ax=ax, c=grid_points['weight'], markersize=10, alpha=0.4)
-        target_point.plot(ax=ax, color='black', markersize=10)
-
-        # [27.6375, -18.1706],[60.8444, 40.1797]
-        ax.set_xlim([-18.1706, 40.1797])
-        ax.set_ylim([27.6375, 60.8444])
-
-        plt.savefig('../visualization/mass_decision_{}.pdf'.format(index)) 
\ No newline at end of file
+        import reporting
+        reporting.plot_map(cropped_grid, target_location, index)
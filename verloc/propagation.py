@@ -1,30 +1,75 @@
 import numpy as np
 
-from math import exp
 from scipy import constants
 
+def constant_speed(fraction):
+    speed = (fraction * constants.speed_of_light) / 1000
+    return lambda x: x / speed
+
+def constant_speed_slope(fraction):
+    speed = (fraction * constants.speed_of_light) / 1000
+    return lambda x: np.full(np.shape(x), 1 / speed)
+
+def paper_speed(x):
+    # ! The empirical speed function uses meters as input
+    return 5.817e+07 * np.exp(1.645e-07*x) -4.785e+07 * np.exp(-2.812e-06*x)
+
+def paper_speed_slope(x):
+    # first derivative of paper_speed
+    return 5.817e+07 * 1.645e-07 * np.exp(1.645e-07*x) + 4.785e+07 * 2.812e-06 * np.exp(-2.812e-06*x)
+
 class Propagation():
+    # all models take a whole np.ndarray of distances and must return an array of the same shape
+    models = {
+        '2/3c': constant_speed(2/3),
+        '1/3c': constant_speed(1/3),
+        'paper': paper_speed,
+    }
+    # first derivatives of the models, optional and only needed for gradient based optimization
+    slopes = {
+        '2/3c': constant_speed_slope(2/3),
+        '1/3c': constant_speed_slope(1/3),
+        'paper': paper_speed_slope,
+    }
+
     # ! units of distance and time
     def __init__(self, speed_func):
+        if speed_func not in self.models:
+            raise ValueError('Unknown propagation model {}, available: {}'.format(speed_func, list(self.models)))
 
-        if speed_func == '2/3c':
-            speed = ((2/3) * constants.speed_of_light) / 1000
-            self.time_func = lambda x: x / speed
+        self.name = speed_func
+        self.time_func = self.models[speed_func]
+        self.slope_func = self.slopes.get(speed_func)
 
-        elif speed_func == '1/3c':
-            speed = ((1/3) * constants.speed_of_light) / 1000
-            self.time_func = lambda x: x / speed
+    @classmethod
+    def register_model(cls, name, time_func, slope_func=None):
+        # e.g. a fitted speed function, evaluated once per array and not once per distance
+        cls.models[name] = time_func
+        if slope_func is not None:
+            cls.slopes[name] = slope_func
+        else:
+            cls.slopes.pop(name, None)
 
-        elif speed_func == 'paper':
-            # ! The empirical speed function uses meters as input
-            self.time_func = lambda x: 5.817e+07 * exp(1.645e-07*x) -4.785e+07 * exp(-2.812e-06*x)
+    def get_times(self, x):
+        # returns the times and a mask that is False wherever the model failed, failed times are 0
+        x = np.asarray(x, dtype=float)
+        try:
+            with np.errstate(all='ignore'):
+                times = np.broadcast_to(np.asarray(self.time_func(x), dtype=float), x.shape)
+            valid = np.isfinite(times)
+        except Exception:
+            times = np.zeros(x.shape)
+            valid = np.zeros(x.shape, dtype=bool)
+
+        return np.where(valid, times, 0)[()], valid[()]
 
     def get_time(self, x):
-        try:
-            time = self.time_func(x)
-        except Exception as e:
-            print ('Failed in Propagation time_func:', e, 'x=', x)
-            time = 0
+        time, valid = self.get_times(x)
         return time
 
-        
\ No newline at end of file
+    def get_slope(self, x):
+        # the localization optimizes with jac=True and needs the derivative of every model it uses
+        if self.slope_func is None:
+            raise ValueError('Propagation model {} has no derivative, register it with a slope_func to use it for localization'.format(self.name))
+
+        return self.slope_func(np.asarray(x, dtype=float))
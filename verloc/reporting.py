@@ -0,0 +1,114 @@
+"""Plots of the performance evaluation
+   Only imported when a plot is requested, so that the compute path never loads
+   matplotlib, seaborn or geopandas.
+"""
+
+import pandas as pd
+import seaborn as sns
+import geopandas as gpd
+import matplotlib.pyplot as plt
+
+from shapely.geometry import Point
+
+import geometry_cache
+
+def plot_location_error(location_error):
+    sns.set_theme()
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 6))
+    ax = sns.histplot(location_error['location_error'], kde=True, ax=ax)
+    plt.savefig('../visualization/location_error.pdf')
+
+def plot_localization(physical_locations, estimated_locations):
+    real_locations = {'geometry': []}
+    esti_locations = {'geometry': []}
+
+    for idx, phy in enumerate(physical_locations):
+        est = estimated_locations[idx]
+        try:
+            real_locations['geometry'].append(Point(float(phy[1]), float(phy[0])))
+            esti_locations['geometry'].append(Point(float(est[1]), float(est[0])))
+
+        except:
+            pass
+
+    phy_points = gpd.GeoDataFrame(real_locations, geometry=real_locations['geometry'])
+    est_points = gpd.GeoDataFrame(esti_locations, geometry=esti_locations['geometry'])
+
+    world = geometry_cache.get_world()
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 10))
+
+    world.boundary.plot(ax=ax, edgecolor='slategray', linewidth=1)
+    est_points.plot(ax=ax, color='xkcd:crimson', markersize=10, alpha=0.4)
+    phy_points.plot(ax=ax, color='black', markersize=10, alpha=0.4)
+
+    # [27.6375, -18.1706],[60.8444, 40.1797]
+    # zoom in on Europe
+    # TODO automatic focus
+    ax.set_xlim([-18.1706, 40.1797])
+    ax.set_ylim([27.6375, 60.8444])
+
+    plt.savefig('../visualization/estimates.pdf')
+
+def plot_confidences(confidence_scores, location_error):
+    sns.set_theme()
+
+    # non_confident = loc_error_df[loc_error_df['confidence'] < 0.2]
+    # yes_confident = loc_error_df[loc_error_df['confidence'] >= 0.2]
+
+    confidence_scores['fast'] = 1 - confidence_scores['fast']
+    confidence_scores['slow'] = 1 - confidence_scores['slow']
+
+    melted_confidences = pd.melt(confidence_scores, id_vars=['node'], value_vars=['score', 'fast', 'slow'])
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 6))
+    sns.displot(data=melted_confidences, x="value", hue="variable", kind="kde")
+    plt.savefig('../visualization/confidence_comparison.pdf')
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 6))
+    sns.scatterplot(data=location_error, x="location_error", y="confidence")
+    plt.savefig('../visualization/location_confidence.pdf')
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 6))
+    ax = sns.histplot(location_error['confidence'], kde=True, ax=ax)
+    # plt.axvline([0.1, 0.1], [0,100])
+    # plt.axvline([0.2, 0.2], [0,100])
+    # plt.axvline([0.3, 0.3], [0,100])
+    plt.savefig('../visualization/confidences.pdf')
+
+
+    threshold = 0.06
+    location_error['decision'] = 'reject'
+    location_error.loc[(location_error['confidence'] >= threshold), 'decision'] = 'accept'
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 6))
+    sns.displot(data=location_error, x="location_error", hue="decision", kind="kde")
+    plt.savefig('../visualization/confidence_decision.pdf')
+
+def plot_map(cropped_grid, target_location, index):
+    grid = {'geometry': []}
+    weights = []
+    for elem in cropped_grid:
+        grid['geometry'].append(Point(elem[1], elem[0]))
+        weights.append(elem[2])
+
+    grid_points = gpd.GeoDataFrame(grid, geometry=grid['geometry'])
+    grid_points['weight'] = weights
+
+    target = {'geometry': [Point(target_location[1], target_location[0])]}
+    target_point = gpd.GeoDataFrame(target, geometry=target['geometry'])
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 10))
+
+    world = geometry_cache.get_world()
+
+    world.boundary.plot(ax=ax, edgecolor='slategray', linewidth=1)
+    grid_points.plot(ax=ax, c=grid_points['weight'], markersize=10, alpha=0.4)
+    target_point.plot(ax=ax, color='black', markersize=10)
+
+    # [27.6375, -18.1706],[60.8444, 40.1797]
+    ax.set_xlim([-18.1706, 40.1797])
+    ax.set_ylim([27.6375, 60.8444])
+
+    plt.savefig('../visualization/mass_decision_{}.pdf'.format(index))
@@ -0,0 +1,85 @@
+import os
+import time
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory locks (Windows), concurrent writers must use separate run ids
+    fcntl = None
+
+class ResultSink():
+    """
+    Collects result tables in memory and appends them in bulk to one CSV file per table, run and
+    epoch: {directory}/{name}/epoch={epoch}/{run_id}.csv. Files are only ever appended to under an
+    exclusive lock, so worker processes of the same run can flush into the same file; the header is
+    written by whoever creates the file. Records are flushed once flush_size rows are buffered, on
+    flush() and when the sink is used as a context manager, on exit.
+    """
+    def __init__(self, directory='results', epoch='unknown', run_id=None, flush_size=100000):
+        self.directory = directory
+        self.epoch = epoch
+        self.run_id = run_id if run_id is not None else time.strftime('%Y%m%d-%H%M%S')
+        self.flush_size = flush_size
+
+        self.buffers = {}
+        self.buffered_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def __getstate__(self):
+        # workers get an empty copy of the sink that writes to the same files
+        state = self.__dict__.copy()
+        state['buffers'] = {}
+        state['buffered_rows'] = 0
+        return state
+
+    def get_path(self, name, epoch=None):
+        epoch = self.epoch if epoch is None else epoch
+        return os.path.join(self.directory, name, 'epoch={}'.format(epoch), '{}.csv'.format(self.run_id))
+
+    def add(self, name, records):
+        # records is a DataFrame or a dict of columns
+        records = pd.DataFrame(records)
+        self.buffers.setdefault(name, []).append(records)
+        self.buffered_rows += len(records)
+
+        if self.buffered_rows >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        for name, frames in self.buffers.items():
+            frames = [x for x in frames if len(x) > 0]
+            if len(frames) > 0:
+                self.append(self.get_path(name), pd.concat(frames, ignore_index=True))
+
+        self.buffers = {}
+        self.buffered_rows = 0
+
+    def append(self, path, records):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, 'a', newline='') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                # the end of the file is only known once the lock is held
+                f.seek(0, os.SEEK_END)
+                records.to_csv(f, sep=',', index=False, header=f.tell() == 0)
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read(self, name, epoch=None):
+        # everything this run has flushed for one table and epoch
+        path = self.get_path(name, epoch)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+
+        return pd.read_csv(path)
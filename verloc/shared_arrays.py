@@ -0,0 +1,78 @@
+import numpy as np
+
+from multiprocessing import shared_memory
+
+# shared memory blocks a worker process attached to, kept open for the lifetime of the worker
+attached_blocks = {}
+
+class SharedArrays():
+    """
+    Copies numeric or fixed-width string arrays once into multiprocessing.shared_memory blocks.
+    get_spec() returns a small picklable description that worker processes pass to attach()
+    to get zero-copy views of the same memory. The creating process owns the blocks and
+    releases them with close().
+    """
+    def __init__(self, arrays):
+        self.blocks = {}
+        self.arrays = {}
+        self.spec = {}
+
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            if array.dtype.hasobject:
+                raise TypeError('Array {} has dtype object and cannot be shared, use a fixed-width dtype'.format(name))
+
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            view[...] = array
+
+            self.blocks[name] = block
+            self.arrays[name] = view
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def get_spec(self):
+        return self.spec
+
+    def close(self):
+        self.arrays = {}
+        for block in self.blocks.values():
+            try:
+                block.close()
+            except BufferError:
+                # views handed out by this process are still alive, the memory goes with them
+                pass
+            block.unlink()
+        self.blocks = {}
+
+def attach(spec):
+    # returns read-only views of all arrays in spec, without copying
+    arrays = {}
+    for name, (block_name, shape, dtype) in spec.items():
+        if block_name not in attached_blocks:
+            # workers share the resource tracker of the creating process, which unlinks the block
+            attached_blocks[block_name] = shared_memory.SharedMemory(name=block_name)
+
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=attached_blocks[block_name].buf)
+        array.flags.writeable = False
+        arrays[name] = array
+
+    return arrays
+
+def detach(spec):
+    # closes the views of a finished spec, e.g. the schedule of a previous replicate
+    for block_name, shape, dtype in spec.values():
+        block = attached_blocks.pop(block_name, None)
+        if block is not None:
+            try:
+                block.close()
+            except BufferError:
+                pass
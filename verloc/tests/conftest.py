@@ -1,9 +1,13 @@
 import pytest
 import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+from shapely.geometry import box
 
 from verloc.localization import Localizer
 from verloc.verification import Verifier
-from verloc.inputs import Network
+from verloc.inputs import Network, Node
 from verloc.propagation import Propagation
 from verloc.performance_eval import LocalizationPerformance
 
@@ -87,3 +91,58 @@ def their_measured_times():
     their_times = np.array([0.0216293782262918,0.0402697867628947,0.0315473818748311,0.0203570647624914,0.0245536181917579,0.0340079135970687,0.0238622558888451,0.0191199543772947,0.0198910333145327,0.0267000667288268])
 
     return their_times
+
+@pytest.fixture
+def propagation_table():
+    # FromIndex, ToIndex, TimeFromTo, TimeToFrom, distances (m), speeds (m/s)
+    prop = pd.DataFrame({
+        'FromIndex':  [1, 1, 2, 3, 4, 3],
+        'ToIndex':    [2, 3, 3, 1, 1, 4],
+        'TimeFromTo': [0.010, 0.020, 0.030, 0.021, 0.040, 0.050],
+        'TimeToFrom': [0.011, 0.022, 0.033, 0.023, 0.044, 0.055],
+        'distances':  [1000000.0, 2000000.0, 3000000.0, 2000000.0, 4000000.0, 5000000.0],
+        'speeds':     [1e+08, 1e+08, 1e+08, 1e+08, 1e+08, 1e+08],
+    })
+
+    return prop
+
+@pytest.fixture
+def synthetic_network():
+    # 60 nodes on 30 distinct locations, every node can reach every other node
+    rng = np.random.default_rng(0)
+    locations = rng.uniform([40, -5], [55, 25], size=(30, 2))
+
+    network = {}
+    for node_id in range(1, 61):
+        lat, lon = locations[node_id % 30]
+        network[node_id] = Node(node_id, 'key{}'.format(node_id), '10.0.0.{}'.format(node_id), lat, lon, 'DEU', 'Germany')
+
+    for node_id in network:
+        network[node_id].set_available_references(np.array([x for x in network if x != node_id]))
+
+    return network
+
+@pytest.fixture
+def synthetic_world():
+    # three rectangular European countries side by side and one country outside of Europe
+    world = gpd.GeoDataFrame({
+        'name':      ['Westland', 'Midland', 'Eastland', 'Farland'],
+        'continent': ['Europe', 'Europe', 'Europe', 'Asia'],
+        'geometry':  [box(0, 45, 10, 55), box(10, 45, 20, 55), box(20, 45, 30, 55), box(60, 30, 70, 40)],
+    }, crs='EPSG:4326')
+
+    return world
+
+@pytest.fixture
+def world_cache(synthetic_world):
+    # the package modules import geometry_cache without the verloc prefix, inject into both
+    import geometry_cache
+    import verloc.geometry_cache
+
+    for module in (geometry_cache, verloc.geometry_cache):
+        module.set_world(synthetic_world)
+
+    yield verloc.geometry_cache
+
+    for module in (geometry_cache, verloc.geometry_cache):
+        module.cache.clear()
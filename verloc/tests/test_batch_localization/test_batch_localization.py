@@ -0,0 +1,43 @@
+import pytest
+import numpy as np
+
+from verloc.localization import Localizer
+from verloc.batch_localization import BatchLocalizer
+
+@pytest.fixture
+def batch_object(my_measured_times, their_measured_times, reference_coordinates):
+    # node 0 uses all references, node 1 the first 6 and node 2 has none
+    my_times = np.zeros((3, 10))
+    their_times = np.zeros((3, 10))
+    mask = np.zeros((3, 10), dtype=bool)
+
+    my_times[:2] = my_measured_times
+    their_times[:2] = their_measured_times
+    mask[0] = True
+    mask[1, :6] = True
+
+    reference_locations = np.array([reference_coordinates] * 3)
+
+    return BatchLocalizer(my_times, their_times, reference_locations, mask)
+
+def test_batch_shapes(batch_object):
+    estimates, iterations = batch_object.estimate_locations()
+
+    assert estimates.shape == (3, 2)
+    assert np.isfinite(estimates[:2]).all()
+    assert np.isnan(estimates[2]).all()
+    assert iterations[0] > 0 and iterations[2] == 0
+
+def test_batch_matches_single_node(batch_object, my_measured_times, their_measured_times, reference_coordinates):
+    estimates, iterations = batch_object.estimate_locations()
+
+    for i, num_refs in enumerate([10, 6]):
+        loc = Localizer(my_measured_times[:num_refs], their_measured_times[:num_refs], reference_coordinates[:num_refs])
+        single_estimate, duration = loc.estimate_location()
+
+        batch_rmse = loc.error_rmse_and_gradient(estimates[i])[0]
+        single_rmse = loc.error_rmse_and_gradient(single_estimate)[0]
+        initial_rmse = loc.error_rmse_and_gradient(batch_object.prepare_initial_guess()[i])[0]
+
+        assert batch_rmse < initial_rmse
+        assert batch_rmse <= single_rmse * 1.01
@@ -0,0 +1,46 @@
+import pytest
+import numpy as np
+
+from verloc.inputs import NodeTable
+from verloc.geodesy import one_to_many
+from verloc.propagation import Propagation
+from verloc.confidence import ConfidenceScorer, EpochConfidenceScorer
+
+@pytest.fixture
+def node_table(synthetic_network):
+    # times around the paper propagation model, some of them too fast or too slow
+    rng = np.random.default_rng(3)
+    prop = Propagation('paper')
+
+    node_ids = list(synthetic_network)[:20]
+    table = NodeTable.from_network({x: synthetic_network[x] for x in node_ids})
+
+    num_refs = rng.integers(0, 8, size=len(node_ids))
+    mask = np.arange(8)[None, :] < num_refs[:, None]
+    ref_locations = rng.uniform([40, -5], [55, 25], size=(len(node_ids), 8, 2))
+
+    my_times = np.zeros((len(node_ids), 8))
+    their_times = np.zeros((len(node_ids), 8))
+    for i in range(len(node_ids)):
+        distances = one_to_many(table.locations[i], ref_locations[i]) * 1000
+        times = distances / prop.get_time(distances)
+        my_times[i] = times * rng.uniform(0.5, 3, 8)
+        their_times[i] = times * rng.uniform(0.5, 3, 8)
+
+    table.set_measurements(my_times, their_times, ref_locations, mask)
+
+    return table
+
+def test_epoch_matches_nodes(node_table):
+    scores, fast, slow = EpochConfidenceScorer.from_table(node_table).compute_confidence()
+
+    for i in range(len(node_table)):
+        expected = ConfidenceScorer(node_table.view(i)).compute_confidence()
+
+        assert (scores[i], fast[i], slow[i]) == expected
+
+def test_epoch_without_pairs():
+    scorer = EpochConfidenceScorer([], [], [], [], num_nodes=3)
+    scores, fast, slow = scorer.compute_confidence()
+
+    assert list(scores) == [0, 0, 0]
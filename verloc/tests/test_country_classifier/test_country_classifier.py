@@ -0,0 +1,111 @@
+import pytest
+import numpy as np
+
+from shapely.geometry import box
+
+from verloc import country_classifier
+from verloc.country_classifier import CountryClassifier, CountryRaster, europe_classifier, use_raster
+from verloc.verification import Verifier
+
+def test_classify(world_cache):
+    classifier = CountryClassifier.from_europe()
+
+    # (lat, lon): Westland, Eastland, the sea, Farland (not in Europe) and the Midland/Eastland border
+    points = [(50, 5), (50, 25), (20, 0), (35, 65), (50, 20)]
+
+    assert list(classifier.classify(points)) == [0, 2, -1, -1, -1]
+    assert classifier.get_names() == ['Westland', 'Midland', 'Eastland']
+
+def test_classify_empty(world_cache):
+    labels = CountryClassifier.from_world().classify([])
+
+    assert labels.shape == (0,)
+
+def test_overlap_first_wins():
+    classifier = CountryClassifier([box(0, 0, 10, 10), box(5, 5, 15, 15)], ['first', 'second'])
+
+    assert list(classifier.classify([(7, 7), (12, 12)])) == [0, 1]
+
+@pytest.fixture
+def grid_verifier(world_cache, my_measured_times, their_measured_times, reference_coordinates):
+    schedule = list(range(len(reference_coordinates)))
+    ver = Verifier(my_measured_times, their_measured_times, schedule, reference_coordinates, None)
+
+    # two points in Westland, one in Midland, one in the sea
+    ver.lat_lon_grid = [(50, 5), (46, 2), (50, 15), (20, 0)]
+
+    return ver
+
+def test_crop_to_land(grid_verifier):
+    grid_verifier.crop_to_land()
+
+    assert grid_verifier.lat_lon_grid.tolist() == [[50, 5], [46, 2], [50, 15]]
+
+def test_decide_country(grid_verifier, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'mp').mkdir()
+
+    class Me:
+        node_id = 1
+
+    grid_verifier.me = Me()
+    grid_verifier.normalized_diffs = np.array([0.3, 0.4, 0.6, 1.0])
+    grid_verifier.decide_country()
+
+    # the sea point is ignored, Westland sums up 0.3 + 0.4
+    assert grid_verifier.get_decision() == 'Westland'
+    assert grid_verifier.country_weights == {'Westland': [pytest.approx(0.7)], 'Midland': [pytest.approx(0.6)]}
+
+def test_raster_matches_polygons(world_cache):
+    classifier = CountryClassifier.from_europe()
+    raster = CountryRaster.build(classifier, bounds=((40, -5), (60, 35)), cell_size=0.7)
+
+    rng = np.random.default_rng(0)
+    points = np.concatenate([rng.uniform([30, -10], [65, 40], size=(2000, 2)), [(50, 10), (45, 5), (50, 20.01)]])
+
+    assert list(raster.classify(points)) == list(classifier.classify(points))
+    assert 0 < raster.get_border_fraction() < 1
+
+def test_raster_written_once(world_cache, tmp_path, monkeypatch):
+    classifier = CountryClassifier.from_europe()
+    path = str(tmp_path / 'raster.npz')
+
+    first = CountryRaster.load_or_build(classifier, path=path, cell_size=1.0)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('raster was built again')
+    monkeypatch.setattr(CountryRaster, 'build', fail)
+
+    second = CountryRaster.load_or_build(classifier, path=path, cell_size=1.0)
+
+    assert (second.labels == first.labels).all()
+    assert (second.border == first.border).all()
+
+def test_raster_of_other_world(world_cache, tmp_path):
+    classifier = CountryClassifier.from_europe()
+    path = str(tmp_path / 'raster.npz')
+    CountryRaster.load_or_build(classifier, path=path, cell_size=1.0)
+
+    # same country names, but Westland and Midland swapped their shapes
+    geometries = list(classifier.geometries)
+    geometries[0], geometries[1] = geometries[1], geometries[0]
+    moved = CountryClassifier(geometries, classifier.get_names())
+
+    raster = CountryRaster.load_or_build(moved, path=path, cell_size=1.0)
+
+    assert list(raster.classify([(50.5, 5.5), (50.5, 15.5)])) == [1, 0]
+
+def test_use_raster(world_cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(country_classifier, 'raster_settings', {})
+    assert type(europe_classifier()) is CountryClassifier
+
+    path = str(tmp_path / 'raster.npz')
+    use_raster(cell_size=1.0, path=path)
+    raster = europe_classifier()
+
+    assert isinstance(raster, CountryRaster)
+    assert raster.cell_size == 1.0
+
+    # the same settings keep the raster, e.g. in forked pool workers
+    use_raster(cell_size=1.0, path=path)
+    assert europe_classifier() is raster
@@ -0,0 +1,55 @@
+import pytest
+import numpy as np
+
+from verloc.country_lookup import CountryLookup
+from verloc.country_classifier import CountryClassifier
+
+class CountingClassifier(CountryClassifier):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.num_points = 0
+
+    def classify(self, points):
+        self.num_points += len(points)
+        return super().classify(points)
+
+@pytest.fixture
+def classifier(world_cache):
+    europe = world_cache.get_europe()
+    return CountingClassifier(europe['geometry'], europe['name'])
+
+def test_lookup_memoized(classifier):
+    lookup = CountryLookup(classifier)
+    points = [(50, 5), (50, 15), (50.00001, 5.00001), (20, 0), (np.nan, np.nan)]
+
+    labels = lookup.lookup(points)
+    assert list(labels) == [0, 1, 0, -1, -1]
+    assert lookup.get_names(labels) == ['Westland', 'Midland', 'Westland', None, None]
+
+    # the third point rounds to the first, NaN is never classified
+    assert classifier.num_points == 3
+
+    lookup.lookup(points)
+    assert classifier.num_points == 3
+
+def test_lru_bound(classifier):
+    lookup = CountryLookup(classifier, max_size=2)
+    lookup.lookup([(50, 5), (50, 15)])
+    lookup.lookup([(50, 5)])
+    lookup.lookup([(50, 25)])
+
+    assert list(lookup.memo) == [(50, 5), (50, 25)]
+
+def test_disk_cache(classifier, tmp_path):
+    path = str(tmp_path / 'countries.npz')
+    lookup = CountryLookup(classifier)
+    lookup.lookup([(50, 5), (50, 25)])
+    lookup.save(path)
+
+    loaded = CountryLookup(classifier)
+    assert loaded.load(path)
+    assert list(loaded.lookup([(50, 25), (50, 5)])) == [2, 0]
+    assert classifier.num_points == 2
+
+    other = CountryLookup(CountryClassifier.from_world())
+    assert not other.load(path)
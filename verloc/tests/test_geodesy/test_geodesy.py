@@ -0,0 +1,47 @@
+import numpy as np
+
+import geopy
+import geopy.distance
+
+from vincenty import vincenty
+from verloc.geodesy import distances, one_to_many, distance_matrix, destinations
+
+def test_matches_vincenty(reference_coordinates, location_estimate):
+    expected = np.array([vincenty(location_estimate, x) for x in reference_coordinates])
+
+    assert np.array_equal(one_to_many(location_estimate, reference_coordinates), expected)
+
+def test_coincident_and_diverging_points():
+    assert distances((0.0, 0.0), (0.0, 0.0)) == 0
+    assert distances((0.0, 0.0), (0.5, 179.5)) == 19936.288579
+    assert np.isnan(distances((0.0, 0.0), (0.5, 179.7)))
+
+def test_distance_matrix(reference_coordinates):
+    matrix = distance_matrix(reference_coordinates[:3], reference_coordinates)
+
+    assert matrix.shape == (3, 10)
+    assert np.array_equal(matrix[1], one_to_many(reference_coordinates[1], reference_coordinates))
+    assert matrix[2, 2] == 0
+
+def test_haversine_close_to_vincenty(reference_coordinates, location_estimate):
+    exact = one_to_many(location_estimate, reference_coordinates)
+    fast = one_to_many(location_estimate, reference_coordinates, method='haversine')
+
+    assert np.allclose(fast, exact, rtol=0.005)
+
+def test_destinations_match_geodesic(reference_coordinates):
+    bearings = np.array([0, 45, 90, 180, -90, 135, -170, 10, 300, 270])
+    steps = np.array([0, 50, 100, 500, 1000, 1500, 2000, 2500, 50, 3000])
+
+    expected = []
+    for point, bearing, step in zip(reference_coordinates, bearings, steps):
+        destination = geopy.distance.geodesic(kilometers=step).destination(point=geopy.Point(point), bearing=bearing)
+        expected.append((destination.latitude, destination.longitude))
+
+    assert np.allclose(destinations(reference_coordinates, bearings, steps), expected, rtol=0, atol=1e-8)
+
+def test_destinations_broadcast(reference_coordinates):
+    grid = destinations(np.asarray(reference_coordinates)[:, None, :], 90, np.arange(5)[None, :] * 50)
+
+    assert grid.shape == (10, 5, 2)
+    assert np.allclose(grid[:, 0], reference_coordinates)
@@ -0,0 +1,35 @@
+from shapely.geometry import Point
+
+from verloc import geometry_cache
+from verloc.verification import Verifier
+
+def test_world_path_loaded_once(synthetic_world, tmp_path):
+    path = tmp_path / 'world.geojson'
+    synthetic_world.to_file(path, driver='GeoJSON')
+
+    geometry_cache.set_world_path(str(path))
+    try:
+        world = geometry_cache.get_world()
+        path.unlink()
+
+        # the second access must not touch the file again
+        assert geometry_cache.get_world() is world
+        assert geometry_cache.get_countries() == ['Westland', 'Midland', 'Eastland']
+    finally:
+        geometry_cache.set_world_path(None)
+
+def test_prepared_polygons(world_cache):
+    polygons = world_cache.get_prepared_eu_polygons()
+
+    assert list(polygons) == ['Westland', 'Midland', 'Eastland']
+    assert polygons['Midland'].contains(Point(15, 50))
+    assert not polygons['Westland'].contains(Point(15, 50))
+    assert len(world_cache.get_prepared_world_geometries()) == 4
+
+def test_verifiers_share_geometry(world_cache, my_measured_times, their_measured_times, reference_coordinates):
+    schedule = list(range(len(reference_coordinates)))
+    first = Verifier(my_measured_times, their_measured_times, schedule, reference_coordinates, None)
+    second = Verifier(my_measured_times, their_measured_times, schedule, reference_coordinates, None)
+
+    assert first.eu_polygons is second.eu_polygons
+    assert first.countries == ['Westland', 'Midland', 'Eastland']
@@ -0,0 +1,72 @@
+import numpy as np
+
+from verloc.geodesy import one_to_many, distances
+from verloc.grid_cache import EqualAreaGrid, GridCache, METERS_PER_DEGREE
+from verloc.country_classifier import CountryClassifier
+from verloc.verification import Verifier
+
+def test_equal_area(world_cache):
+    grid = EqualAreaGrid(50000)
+    points = grid.points
+
+    # neighbors in a row and the first points of two rows are about one resolution apart
+    same_row = points[1:, 0] == points[:-1, 0]
+    steps = distances(points[:-1][same_row], points[1:][same_row], method='haversine')
+    row_starts = np.flatnonzero(np.concatenate([[True], ~same_row]))
+    row_steps = np.abs(np.diff(points[row_starts, 0])) * METERS_PER_DEGREE / 1000
+
+    assert np.allclose(steps, 50, rtol=0.01)
+    assert np.allclose(row_steps, 50)
+    assert points[:, 0].max() <= 60.8444 and points[:, 1].min() >= -18.1706
+
+def test_labels(world_cache):
+    grid = EqualAreaGrid(100000)
+
+    assert np.array_equal(grid.labels, CountryClassifier.from_europe().classify(grid.points))
+    assert np.array_equal(grid.land, CountryClassifier.from_world().classify(grid.points) >= 0)
+
+def test_select(world_cache):
+    grid = EqualAreaGrid(50000)
+    center = (48.3, 17.4)
+
+    index, selected_distances = grid.select(center, 600000)
+    all_distances = one_to_many(center, grid.points) * 1000
+
+    assert np.array_equal(index, np.flatnonzero(all_distances <= 600000))
+    assert np.allclose(selected_distances, all_distances[index])
+
+def test_eviction(world_cache):
+    sizes = {x: len(EqualAreaGrid(x)) for x in (400000, 300000, 200000)}
+    cache = GridCache(max_points=sizes[400000] + sizes[300000] + sizes[200000] - 1)
+
+    coarse = cache.get_grid(400000)
+    cache.get_grid(200000)
+    assert cache.get_grid(400000) is coarse
+
+    # the least recently used grid goes first, the grid in use is always kept
+    cache.get_grid(300000)
+    assert list(cache.grids) == [400000, 300000]
+
+    cache.get_grid(50000)
+    assert list(cache.grids) == [50000]
+
+class Me:
+    node_id = 1
+    def get_location(self):
+        return (50.5, 14.5)
+
+def test_verify_with_grid_cache(world_cache, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'mp').mkdir()
+
+    # the node sits in Midland, every reference reports times that fit the distance at 2/3c
+    reference_locations = [(52, 12), (47, 25), (49, 3), (53, 18), (46, 8), (51, 27)]
+    times = one_to_many(Me().get_location(), reference_locations) * 1000 / ((2/3) * 299792458) * 1.2
+
+    decisions = []
+    for cache in (None, GridCache()):
+        ver = Verifier(times, times, list(range(6)), reference_locations, Me(), grid_cache=cache)
+        decision, grid = ver.verify_location()
+        decisions.append(decision)
+
+    assert decisions == ['Midland', 'Midland']
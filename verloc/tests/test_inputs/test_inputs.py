@@ -1,8 +1,12 @@
+import os
 import pytest
+import numpy as np
 import pandas as pd
 
 from verloc.inputs import Measurement
 from verloc.inputs import Node
+from verloc.inputs import NodeTable
+from verloc.inputs import RaggedArray
 from verloc.inputs import Network
 from verloc.inputs import Schedule
 from verloc.inputs import TimingData
@@ -62,3 +66,210 @@ def test_assign_timings_to_network(net_object):
     node_0_my_measurements = net_object[0].get_my_measurements()
 
     assert len(node_0_my_measurements) == num_refs
+
+def test_pair_index(propagation_table):
+    timing = TimingData('now', propagation_table)
+
+    # measured from node 1
+    assert timing.get_pair_timings(1, 2) == (0.010, 0.011)
+    # only measured from node 2, directions are swapped
+    assert timing.get_pair_timings(2, 1) == (0.011, 0.010)
+    # measured from both sides, own measurement wins
+    assert timing.get_pair_timings(1, 3) == (0.020, 0.022)
+    assert timing.get_pair_timings(3, 1) == (0.021, 0.023)
+    # never measured
+    assert timing.get_pair_timings(2, 4) == (None, None)
+    assert timing.get_pair_timings(1, 99) == (None, None)
+
+def test_assign_timings_from_pair_index(propagation_table):
+    timing = TimingData('now', propagation_table)
+    network = {x: Node(x, 'key{}'.format(x), '1.2.3.{}'.format(x), 50, x, 'DEU', 'Germany') for x in [1, 2, 3, 4]}
+    schedule = {1: [2, 3, 4], 2: [1], 3: [], 4: [2]}
+
+    timing.assign_timings_to_network(schedule, network)
+
+    assert network[1].get_my_measurements() == [0.010, 0.020, 0.044]
+    assert network[1].get_their_measurements() == [0.011, 0.022, 0.040]
+    assert network[2].get_my_measurements() == [0.011]
+    assert network[4].get_my_measurements() == []
+
+def test_define_available_references(propagation_table):
+    timing = TimingData('now', propagation_table)
+    # node 4 is not part of the network
+    network = {x: Node(x, 'key{}'.format(x), '1.2.3.{}'.format(x), 50, x, 'DEU', 'Germany') for x in [1, 2, 3]}
+
+    available_references = timing.define_available_references(network)
+
+    assert list(network[1].get_available_references()) == [2, 3]
+    assert list(network[2].get_available_references()) == [3]
+    assert list(network[3].get_available_references()) == [1]
+    assert available_references[3].dtype == np.int64
+
+def test_schedule_seeded(synthetic_network):
+    num_refs = 10
+
+    schedule = Schedule(num_refs, synthetic_network, seed=7).get_schedule()
+    repeated = Schedule(num_refs, synthetic_network, seed=7).get_schedule()
+
+    assert schedule == repeated
+
+    for node_id in schedule:
+        refs = schedule[node_id]
+        ref_locations = [synthetic_network[x].get_location() for x in refs]
+
+        assert len(refs) == num_refs
+        assert len(set(refs)) == len(refs)
+        assert node_id not in refs
+        assert synthetic_network[node_id].get_location() not in ref_locations
+
+def test_schedule_symmetric(synthetic_network):
+    schedule = Schedule(10, synthetic_network, seed=1).get_schedule()
+
+    # the first node is scheduled while all references still have room, so it is added to all of them
+    assert all(1 in schedule[ref] for ref in schedule[1])
+
+def test_node_table(propagation_table):
+    timing = TimingData('now', propagation_table)
+    network = {x: Node(x, 'key{}'.format(x), '1.2.3.{}'.format(x), 50, x, 'DEU', 'Germany') for x in [1, 2, 3, 4]}
+    schedule = {1: [2, 3, 4], 2: [1], 3: [], 4: [2]}
+
+    timing.assign_timings_to_network(schedule, network)
+
+    table = NodeTable.from_network({x: Node(x, 'key{}'.format(x), '1.2.3.{}'.format(x), 50, x, 'DEU', 'Germany') for x in [1, 2, 3, 4]})
+    table.set_available_references(timing.define_available_references(network))
+    table.set_schedule(schedule, timing)
+
+    assert list(table) == [1, 2, 3, 4]
+    for node_id in network:
+        view = table[node_id]
+
+        assert view.get_location() == network[node_id].get_location()
+        assert view.get_identity_key() == network[node_id].get_identity_key()
+        assert list(view.get_schedule()) == schedule[node_id]
+        assert list(view.get_my_measurements()) == network[node_id].get_my_measurements()
+        assert list(view.get_their_measurements()) == network[node_id].get_their_measurements()
+        assert list(view.get_available_references()) == list(network[node_id].get_available_references())
+
+    # node 4 has no measurement with node 2, so its reference is dropped
+    assert table[4].get_ref_locations().shape == (0, 2)
+    assert table[1].get_ref_locations().tolist() == [[50, 2], [50, 3], [50, 4]]
+
+def test_ragged_array():
+    ragged = RaggedArray.from_lists([[1, 2], [], [3]], dtype=np.int64)
+
+    assert list(ragged.offsets) == [0, 2, 2, 3]
+    assert list(ragged[0]) == [1, 2]
+    assert len(ragged[1]) == 0
+    assert list(ragged.get_rows()) == [0, 0, 2]
+
+def test_timing_data_cache(propagation_table, tmp_path):
+    path = tmp_path / 'melted_propagation_01-01-2021.csv'
+    propagation_table.to_csv(path, index=False)
+    cache_directory = str(tmp_path / 'cache')
+
+    parsed = TimingData('now', propagation_table.copy())
+    parsed.load(str(path), cache_directory)
+    cached = TimingData('now', propagation_table.copy())
+    cached.load(str(path), cache_directory)
+
+    # the second load memory-maps the scaled table and the RTT matrices
+    assert isinstance(cached.my_rtt, np.memmap)
+    assert list(cached.propagation.columns) == list(propagation_table.columns)
+    assert cached.propagation['distances'].tolist() == [1000.0, 2000.0, 3000.0, 2000.0, 4000.0, 5000.0]
+    assert np.array_equal(cached.my_rtt, parsed.my_rtt, equal_nan=True)
+    assert np.array_equal(cached.their_rtt, parsed.their_rtt, equal_nan=True)
+    assert cached.get_pair_timings(2, 1) == (0.011, 0.010)
+    assert cached.get_pair_timings(2, 4) == (None, None)
+
+    network = {x: Node(x, 'key{}'.format(x), '1.2.3.{}'.format(x), 50, x, 'DEU', 'Germany') for x in [1, 2, 3]}
+    assert list(cached.define_available_references(network)[1]) == [2, 3]
+
+def test_timing_data_cache_content_key(propagation_table, tmp_path):
+    path = tmp_path / 'melted_propagation_01-01-2021.csv'
+    propagation_table.to_csv(path, index=False)
+    cache_directory = str(tmp_path / 'cache')
+
+    timing = TimingData('now', propagation_table.copy())
+    timing.load(str(path), cache_directory)
+
+    # a changed file of the same date is parsed again instead of served from the old cache
+    modified = path.stat().st_mtime_ns
+    propagation_table.loc[0, 'TimeFromTo'] = 0.015
+    propagation_table.to_csv(path, index=False)
+    os.utime(path, ns=(modified + 10**9, modified + 10**9))
+    timing.load(str(path), cache_directory)
+
+    assert timing.get_pair_timings(1, 2) == (0.015, 0.011)
+    assert len([x for x in (tmp_path / 'cache').iterdir() if x.is_dir()]) == 2
+
+def test_timing_data_cache_hashed_once(propagation_table, tmp_path, monkeypatch):
+    import input_cache
+
+    path = tmp_path / 'melted_propagation_01-01-2021.csv'
+    propagation_table.to_csv(path, index=False)
+    cache_directory = str(tmp_path / 'cache')
+
+    hashed = []
+    content_hash = input_cache.content_hash
+    monkeypatch.setattr(input_cache, 'content_hash', lambda x: hashed.append(x) or content_hash(x))
+
+    timing = TimingData('now', propagation_table.copy())
+    timing.load(str(path), cache_directory)
+    timing.load(str(path), cache_directory)
+    assert len(hashed) == 1
+
+    # touching the file only costs a new hash, the cached arrays are reused
+    os.utime(path, ns=(path.stat().st_mtime_ns + 10**9,) * 2)
+    timing.load(str(path), cache_directory)
+    assert len(hashed) == 2
+    assert isinstance(timing.my_rtt, np.memmap)
+
+def test_timing_data_cache_same_name(propagation_table, tmp_path):
+    cache_directory = str(tmp_path / 'cache')
+    paths = []
+    for directory, time in [('static_data', 0.012), ('copy', 0.013)]:
+        (tmp_path / directory).mkdir()
+        table = propagation_table.copy()
+        table.loc[0, 'TimeFromTo'] = time
+        paths.append(tmp_path / directory / 'melted_propagation_01-01-2021.csv')
+        table.to_csv(paths[-1], index=False)
+
+    # same name, size and modification time, only the content differs
+    modified = paths[0].stat().st_mtime_ns
+    for path in paths:
+        os.utime(path, ns=(modified, modified))
+
+    timing = TimingData('now', propagation_table.copy())
+    for path, time in zip(paths * 2, [0.012, 0.013] * 2):
+        timing.load(str(path), cache_directory)
+        assert timing.get_pair_timings(1, 2) == (time, 0.011)
+
+def test_read_identities_cache(tmp_path):
+    path = tmp_path / 'eu_node_identities_01-01-2021.csv'
+    pd.DataFrame({'id': [5, 6], 'identity_key': ['abc', 'def'], 'ip': ['1.2.3.4:1789', '1.2.3.5:1789'],
+                  'lat': [52.35, 48.1], 'lon': [4.91, 11.5], 'country': ['Netherlands', 'Germany'],
+                  'iso3': ['NLD', 'DEU']}).to_csv(path, index=False)
+    cache_directory = str(tmp_path / 'cache')
+
+    parsed = Network.read_identities(str(path), cache_directory)
+    cached = Network.read_identities(str(path), cache_directory)
+
+    assert list(cached.columns) == list(parsed.columns)
+    assert cached['id'].tolist() == [5, 6]
+    assert cached['iso3'].tolist() == ['NLD', 'DEU']
+    assert cached['lat'].tolist() == [52.35, 48.1]
+
+def test_read_identities_cache_missing_text(tmp_path):
+    path = tmp_path / 'eu_node_identities_01-01-2021.csv'
+    pd.DataFrame({'id': [5, 6], 'identity_key': ['abc', 'def'], 'ip': ['1.2.3.4:1789', None],
+                  'country': [None, 'Germany']}).to_csv(path, index=False)
+    cache_directory = str(tmp_path / 'cache')
+
+    parsed = Network.read_identities(str(path), cache_directory)
+    cached = Network.read_identities(str(path), cache_directory)
+
+    # missing values stay missing instead of becoming the text 'nan'
+    for frame in (parsed, cached):
+        assert frame['ip'].isna().tolist() == [False, True]
+        assert frame['country'].isna().tolist() == [True, False]
+        assert frame['country'][1] == 'Germany'
@@ -45,3 +45,15 @@ def test_estimate_location(loc_object):
         print ('ERROR IN ESTIMATE: ', e)
 
     assert success == True
+
+def test_error_rmse_gradient(loc_object):
+    location_estimate = np.array([45.4, 20.0])
+    rmse, gradient = loc_object.error_rmse_and_gradient(location_estimate)
+
+    step = 1e-6
+    numeric = [(loc_object.error_rmse_and_gradient(location_estimate + x)[0] - rmse) / step for x in np.eye(2) * step]
+
+    assert gradient.shape == (2,)
+    assert np.allclose(gradient, numeric, rtol=1e-3)
+    # the spherical objective stays close to the ellipsoidal one
+    assert abs(rmse - loc_object.error_rmse(location_estimate)) / rmse < 0.005
@@ -2,6 +2,8 @@ import pytest
 import numpy as np
 from math import floor
 
+from verloc.country_lookup import CountryLookup
+from verloc.country_classifier import CountryClassifier
 from verloc.performance_eval import LocalizationPerformance
 
 def test_compute_location_error(loc_performance_object):
@@ -16,3 +18,29 @@ def test_compare_countries(loc_performance_object):
     cc_acc = loc_performance_object.get_cc_accuracy()
 
     assert cc_acc > 0
+
+def test_compare_countries_outside_of_index(world_cache):
+    europe = world_cache.get_europe()
+    lookup = CountryLookup(CountryClassifier(europe['geometry'], europe['name']))
+
+    # same country, different countries, both at sea, estimate at sea
+    physical_locations = [(50, 5), (50, 5), (20, 0), (50, 15)]
+    estimated_locations = [(51, 6), (50, 15), (21, 1), (20, 0)]
+
+    performance = LocalizationPerformance(physical_locations, estimated_locations, None, None, 0, lookup=lookup)
+    performance.compare_countries()
+
+    assert performance.get_cc_accuracy() == 0.25
+
+def test_compute_path_without_plotting():
+    import os
+    import sys
+    import subprocess
+
+    # a fresh interpreter, like a worker process, must not load the plotting libraries
+    verloc_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    probe = 'import sys; import VerLoc; print([x for x in ("matplotlib", "seaborn", "geopandas") if x in sys.modules])'
+    output = subprocess.run([sys.executable, '-c', probe], cwd=verloc_dir, env={**os.environ, 'PYTHONPATH': verloc_dir},
+        check=True, capture_output=True, text=True).stdout
+
+    assert output.strip() == '[]'
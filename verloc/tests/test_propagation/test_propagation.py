@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from verloc.propagation import Propagation
 
 @pytest.mark.parametrize('speed_func', ['2/3c', '1/3c', 'paper'])
@@ -11,4 +12,35 @@ def test_constant_speed(prop_object):
 def test_paper_propagation():
     prop_object = Propagation('paper')
 
-    assert prop_object.get_time(1000) == 10463934.94608847
\ No newline at end of file
+    assert prop_object.get_time(1000) == 10463934.94608847
+
+@pytest.mark.parametrize('speed_func', ['2/3c', '1/3c', 'paper'])
+def test_array_propagation(prop_object):
+    distances = np.array([1000, 250000, 1500000])
+
+    times, valid = prop_object.get_times(distances)
+
+    assert times.shape == (3,)
+    assert valid.all()
+    assert times[0] == prop_object.get_time(1000)
+
+def test_failure_mask(monkeypatch):
+    # models is shared by the class, the entry is removed again after the test
+    monkeypatch.setitem(Propagation.models, 'sqrt', lambda x: np.sqrt(x))
+    prop_object = Propagation('sqrt')
+
+    times, valid = prop_object.get_times([4.0, -1.0])
+
+    assert list(times) == [2.0, 0]
+    assert list(valid) == [True, False]
+
+def test_missing_slope(monkeypatch):
+    monkeypatch.setitem(Propagation.models, 'sqrt', lambda x: np.sqrt(x))
+    prop_object = Propagation('sqrt')
+
+    with pytest.raises(ValueError, match='sqrt'):
+        prop_object.get_slope([4.0])
+
+def test_unknown_model():
+    with pytest.raises(ValueError):
+        Propagation('c')
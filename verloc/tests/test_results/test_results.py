@@ -0,0 +1,46 @@
+import multiprocessing
+
+import pandas as pd
+
+from verloc.results import ResultSink
+
+def write_records(sink, worker):
+    for batch in range(5):
+        sink.add('location_error', {'worker': [worker] * 20, 'batch': [batch] * 20, 'value': list(range(20))})
+    sink.flush()
+
+def test_buffer_and_partition(tmp_path):
+    sink = ResultSink(str(tmp_path), epoch='25-06-2021', run_id='run', flush_size=100)
+
+    sink.add('verification', {'phy': ['Germany'], 'ver': ['Germany']})
+    assert not (tmp_path / 'verification').exists()
+
+    sink.flush()
+    sink.add('verification', pd.DataFrame({'phy': ['France'], 'ver': ['Spain']}))
+    sink.flush()
+
+    path = tmp_path / 'verification' / 'epoch=25-06-2021' / 'run.csv'
+    assert path.read_text().count('phy,ver') == 1
+    assert list(sink.read('verification')['ver']) == ['Germany', 'Spain']
+
+def test_flush_size(tmp_path):
+    sink = ResultSink(str(tmp_path), run_id='run', flush_size=10)
+    sink.add('comp', {'value': list(range(10))})
+
+    assert len(sink.read('comp')) == 10
+    assert sink.buffered_rows == 0
+
+def test_concurrent_writers(tmp_path):
+    sink = ResultSink(str(tmp_path), epoch='1', run_id='run', flush_size=30)
+
+    processes = [multiprocessing.Process(target=write_records, args=(sink, x)) for x in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    records = sink.read('location_error')
+
+    assert len(records) == 4 * 5 * 20
+    assert sorted(records.groupby('worker').size()) == [100] * 4
+    assert list(records.columns) == ['worker', 'batch', 'value']
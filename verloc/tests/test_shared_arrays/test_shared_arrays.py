@@ -0,0 +1,37 @@
+import pytest
+import numpy as np
+import multiprocessing as mp
+
+from verloc.shared_arrays import SharedArrays, attach, detach
+
+def sum_shared(spec):
+    return float(attach(spec)['rtt'].sum())
+
+def test_attach_without_copy():
+    rtt = np.arange(12, dtype=float).reshape(3, 4)
+    keys = np.array(['abc', 'defgh'])
+
+    with SharedArrays({'rtt': rtt, 'keys': keys}) as shared:
+        arrays = attach(shared.get_spec())
+
+        assert np.array_equal(arrays['rtt'], rtt)
+        assert list(arrays['keys']) == ['abc', 'defgh']
+        assert not arrays['rtt'].flags.writeable
+
+        # the owner writes, the attached view sees it
+        shared['rtt'][0, 0] = 100
+        assert arrays['rtt'][0, 0] == 100
+
+        del arrays
+        detach(shared.get_spec())
+
+def test_attach_in_worker():
+    with SharedArrays({'rtt': np.ones((100, 100))}) as shared:
+        with mp.get_context('spawn').Pool(2) as pool:
+            sums = pool.map(sum_shared, [shared.get_spec()] * 2)
+
+    assert sums == [10000.0, 10000.0]
+
+def test_object_arrays_are_rejected():
+    with pytest.raises(TypeError):
+        SharedArrays({'keys': np.array(['a', None], dtype=object)})
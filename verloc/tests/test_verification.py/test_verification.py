@@ -81,3 +81,67 @@ def test_verify_location(ver_object):
         verify_success = False
 
     assert verify_success == True
+
+@pytest.fixture
+def grid_verifier(world_cache, my_measured_times, their_measured_times, reference_coordinates):
+    schedule = list(range(len(reference_coordinates)))
+    ver = Verifier(my_measured_times, their_measured_times, schedule, reference_coordinates, None)
+
+    ver.compute_lat_grid(reference_coordinates[0], 20)
+    ver.compute_full_grid(20)
+
+    return ver
+
+def test_incremental_crop(grid_verifier, reference_coordinates, monkeypatch):
+    import verloc.verification
+
+    calls = []
+    one_to_many = verloc.verification.one_to_many
+    def counting_one_to_many(*args, **kwargs):
+        calls.append(args)
+        return one_to_many(*args, **kwargs)
+    monkeypatch.setattr(verloc.verification, 'one_to_many', counting_one_to_many)
+
+    target = reference_coordinates[3]
+    full_grid = grid_verifier.lat_lon_grid
+    area_memory = float('inf')
+    for distance_limit in [900000, 700000, 800000, 500000]:
+        grid_verifier.crop_full_grid(target, distance_limit, area_memory)
+        area_memory = grid_verifier.cropped_area
+
+    # limits only ever shrink the grid, the smallest one wins
+    expected = full_grid[one_to_many(target, full_grid) * 1000 <= 500000]
+
+    assert len(calls) == 1
+    assert np.array_equal(grid_verifier.lat_lon_grid, expected)
+    assert len(grid_verifier.target_distances) == len(expected)
+
+def test_weight_cropped_area(grid_verifier, my_measured_times, their_measured_times, reference_coordinates):
+    from verloc.geodesy import one_to_many
+    from verloc.propagation import Propagation
+
+    grid_verifier.sort_by_time()
+    grid_verifier.weight_cropped_area()
+    weights = np.asarray(grid_verifier.normalized_diffs)
+
+    # one reference at a time, like the weighting was originally written
+    prop = Propagation('paper')
+    diffs = []
+    for idx in grid_verifier.get_sorted_propagation()[:,2].astype(int):
+        distances = one_to_many(reference_coordinates[idx], grid_verifier.lat_lon_grid) * 1000
+        times = distances / prop.get_time(distances)
+        diffs.append((np.absolute(times - my_measured_times[idx]) + np.absolute(times - their_measured_times[idx])) / 2)
+    mean_diffs = np.mean(np.array(diffs) / np.amax(diffs), axis=0)
+    expected = 1 - (mean_diffs - mean_diffs.min()) / (mean_diffs.max() - mean_diffs.min())
+
+    assert weights.shape == (len(grid_verifier.lat_lon_grid),)
+    assert np.allclose(weights, expected, rtol=0, atol=1e-12)
+
+    # chunks and float32 only change the precision
+    grid_verifier.weight_chunk_size = 97
+    grid_verifier.weight_cropped_area()
+    assert np.allclose(grid_verifier.normalized_diffs, expected, rtol=0, atol=1e-12)
+
+    grid_verifier.weight_dtype = np.float32
+    grid_verifier.weight_cropped_area()
+    assert np.allclose(grid_verifier.normalized_diffs, expected, rtol=0, atol=1e-4)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from verloc.VerLoc import share_inputs, share_schedule, localize_shard, verify_shard
+from verloc.inputs import Node, TimingData
+
+# VerLoc attaches through the module imported without the verloc prefix
+import shared_arrays
+
+def test_verify_shard_degenerate_node(world_cache, propagation_table):
+    timing = TimingData('now', propagation_table)
+    network = {x: Node(x, 'key{}'.format(x), '1.2.3.{}'.format(x), 50, 5 + x, 'DEU', 'Westland') for x in [1, 2, 3, 4]}
+    # node 4 only has one usable reference, node 2 only references a node at its own location
+    network[2].location = network[3].location
+    schedule = {1: [2, 3, 4], 2: [3], 3: [1], 4: [3]}
+
+    shared_inputs = share_inputs(network, timing)
+    shared_schedule = share_schedule(schedule, network, 3)
+    spec = {**shared_inputs.get_spec(), **shared_schedule.get_spec()}
+
+    try:
+        results, weights, grids = verify_shard(spec, np.arange(len(network)), use_grid_cache=False, keep_grids=True)
+        assert shared_arrays.attached_blocks == {}
+    finally:
+        shared_schedule.close()
+        shared_inputs.close()
+
+    # every node gets a row, the failed ones without weights and with an empty grid
+    assert results['node_id'].tolist() == [1, 2, 3, 4]
+    failed = results.loc[results['decision'] == -1, 'node_id'].tolist()
+    assert 4 in failed
+    assert not weights['node_id'].isin(failed).any()
+    assert all(len(grids[x]) == 0 for x in failed)
+
+def test_shards_detach(propagation_table):
+    timing = TimingData('now', propagation_table)
+    network = {x: Node(x, 'key{}'.format(x), '1.2.3.{}'.format(x), 50, 5 + x, 'DEU', 'Westland') for x in [1, 2, 3, 4]}
+    schedule = {1: [2, 3], 2: [1, 3], 3: [1, 2], 4: [1, 3]}
+
+    with share_inputs(network, timing) as shared_inputs, share_schedule(schedule, network, 2) as shared_schedule:
+        spec = {**shared_inputs.get_spec(), **shared_schedule.get_spec()}
+        results = localize_shard(spec, np.arange(len(network)), batch=True)
+
+        # pool workers and the single process path release their attachments after every task
+        assert shared_arrays.attached_blocks == {}
+        assert results['node_id'].tolist() == [1, 2, 3, 4]
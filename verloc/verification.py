@@ -1,23 +1,20 @@
 import time
 import sys
-import geopy
-import geopy.distance
 
 import numpy as np
-import pandas as pd
-import geopandas as gpd
 
 from math import pow, floor
 from statistics import median
 from scipy import constants
-from vincenty import vincenty
-from shapely.geometry import Point
-from shapely.geometry.polygon import Polygon
+from geodesy import one_to_many, distance_matrix, destinations
+
+import geometry_cache
 
 from propagation import Propagation
+from country_classifier import europe_classifier, world_classifier
 
 class Verifier():
-    def __init__(self, my_times, their_times, schedule, reference_locations, me):
+    def __init__(self, my_times, their_times, schedule, reference_locations, me, grid_cache=None):
 
         self.my_times = my_times
         self.their_times = their_times
@@ -27,15 +24,28 @@ class Verifier():
         self.me = me
         # self.light_speed = lambda x: constants.speed_of_light * x
 
-        self.world = gpd.read_file(gpd.datasets.get_path('naturalearth_lowres'))
-        self.europe = self.world[self.world['continent'] == 'Europe']
-        self.eu_polygons = {row['name']: row['geometry'] for index, row in self.europe.iterrows()}
-        self.countries = [row['name'] for index, row in self.europe.iterrows()]
+        # shared by all verifiers of the process, loaded on first use
+        self.world = geometry_cache.get_world()
+        self.europe = geometry_cache.get_europe()
+        self.eu_polygons = geometry_cache.get_prepared_eu_polygons()
+        self.countries = geometry_cache.get_countries()
 
         self.cropped_grid = []
-        
+        # distances from the grid points to the crop center, see crop_full_grid
+        self.target_distances = None
+        self.distance_center = None
+
         self.grid_resolution = 50000 # in meters, original implementation 10000
 
+        # optional grid_cache.GridCache, candidate points are then selected from a shared grid
+        self.grid_cache = grid_cache
+        # indices of the grid points in the shared grid, cropped along with the grid
+        self.grid_index = None
+
+        # float32 halves the memory of the weighting for fine grids, at float32 precision
+        self.weight_dtype = np.float64
+        self.weight_chunk_size = 2048 # grid points per distance matrix
+
     def get_grid_resolution(self):
         return self.grid_resolution
     def get_reference_locations(self):
@@ -68,87 +78,101 @@ class Verifier():
 
 
     def compute_grid(self, center_point, bearing, point_range):
-        partial_grid = []
-        for i in point_range:
-            d = geopy.distance.geodesic(meters = self.grid_resolution * i)
-            grid_point = d.destination(point=center_point, bearing=bearing)
-            partial_grid.append((grid_point.latitude, grid_point.longitude))
+        # grid points every grid_resolution meters along bearing, one row per center point
+        steps = np.asarray(point_range, dtype=float) * self.grid_resolution / 1000
+        center_point = np.asarray(center_point, dtype=float).reshape(-1, 1, 2)
 
-        return partial_grid
+        return destinations(center_point, bearing, steps[None, :])
 
     def compute_lat_grid(self, reference_location, num_points):
-        lat_grid = []
-        center = geopy.Point(reference_location)
+        # north to south through the reference, shape (2 * num_points + 1, 2)
+        center = np.asarray(reference_location, dtype=float).reshape(1, 2)
 
-        lat_grid.extend(self.compute_grid(center, 0, range(num_points,0,-1)))
-        lat_grid.append(reference_location)
-        lat_grid.extend(self.compute_grid(center, 180, range(1,num_points+1)))
+        north = self.compute_grid(center, 0, range(num_points,0,-1))[0]
+        south = self.compute_grid(center, 180, range(1,num_points+1))[0]
 
-        self.lat_grid = lat_grid
+        self.lat_grid = np.concatenate([north, center, south])
 
     def compute_full_grid(self, num_points):
-        lat_lon_grid = []
-        for lat_point in self.lat_grid:
-            center = geopy.Point(lat_point)
+        # west to east through every point of the latitude grid, all rows in one computation
+        west = self.compute_grid(self.lat_grid, -90, range(num_points,0,-1))
+        east = self.compute_grid(self.lat_grid, 90, range(1,num_points+1))
 
-            lat_lon_grid.extend(self.compute_grid(center, -90, range(num_points,0,-1)))
-            lat_lon_grid.append(lat_point)
-            lat_lon_grid.extend(self.compute_grid(center, 90, range(1,num_points+1)))
+        lat_lon_grid = np.concatenate([west, self.lat_grid[:, None, :], east], axis=1).reshape(-1, 2)
 
         self.lat_lon_grid = lat_lon_grid
         self.cropped_grid = lat_lon_grid
+        self.target_distances = None
+        self.grid_index = None
+
+    def select_cached_grid(self, reference_location, distance_limit):
+        # same area as compute_lat_grid and compute_full_grid, cut from the shared grid with its labels
+        self.shared_grid = self.grid_cache.get_grid(self.grid_resolution)
+        self.grid_index = self.shared_grid.select_box(reference_location, distance_limit)
+
+        self.lat_lon_grid = self.shared_grid.points[self.grid_index]
+        self.cropped_grid = self.lat_lon_grid
+        self.target_distances = None
 
     def crop_full_grid(self, target_location, distance_limit, area_memory):
-        # compute distances between all grid points and center point
-        distances = [vincenty(target_location, (x[0], x[1]))*1000 for x in self.lat_lon_grid]
+        # distances between all grid points and the target, computed once per grid and cropped along with it
+        if self.target_distances is None or tuple(self.distance_center) != tuple(target_location):
+            self.target_distances = one_to_many(target_location, self.lat_lon_grid) * 1000
+            self.distance_center = target_location
 
         # crop away all points that are too far away
-        # print ('Before:', len(self.lat_lon_grid))
-        cropped_grid = [self.lat_lon_grid[idx] for idx, x in enumerate(distances) if x <= distance_limit]
-        # print ('After:', cropped_grid)
+        within_limit = self.target_distances <= distance_limit
+
+        cropped_area = (np.count_nonzero(within_limit) * pow((0.5*self.grid_resolution), 2)) / 1000000
 
-        cropped_area = (len(cropped_grid) * pow((0.5*self.grid_resolution), 2)) / 1000000
-        
         if cropped_area < area_memory:
-            self.lat_lon_grid = cropped_grid
+            self.lat_lon_grid = self.lat_lon_grid[within_limit]
+            self.target_distances = self.target_distances[within_limit]
+            if self.grid_index is not None:
+                self.grid_index = self.grid_index[within_limit]
             self.cropped_area = cropped_area
 
     def crop_to_land(self):
-        land_cropped = []
-        for point in self.lat_lon_grid:
-            p = Point(point[1], point[0])
-
-            for index, row in self.world.iterrows():
-                if row['geometry'].contains(p):
-                    land_cropped.append(point)
+        # keep every grid point that lies in any country, labeled in one call
+        self.lat_lon_grid = np.asarray(self.lat_lon_grid, dtype=float).reshape(-1, 2)
+        if self.grid_index is not None:
+            on_land = self.shared_grid.land[self.grid_index]
+            self.grid_index = self.grid_index[on_land]
+        else:
+            on_land = world_classifier().classify(self.lat_lon_grid) >= 0
 
-        self.lat_lon_grid = land_cropped
+        self.lat_lon_grid = self.lat_lon_grid[on_land]
+        if self.target_distances is not None:
+            self.target_distances = self.target_distances[on_land]
 
     def weight_cropped_area(self):
         prop = Propagation('paper')
-        
-        diffs = []
-        for elem in self.sorted_propagation:
-            # distances from reference to all points in the grid
-
-            if len(self.lat_lon_grid) > 0:
-                try:
-                    distances = np.array([vincenty(self.reference_locations[int(elem[2])], (x[0], x[1])) * 1000 for x in self.lat_lon_grid])
-                    try:
-                        speeds = np.array([prop.get_time(x) for x in distances])
-                        times = distances / speeds
-                    except:
-                        times = 0
-                except Exception as e:
-                    print ('weight_cropped_area failed:', e)
-            else:
-                times = 0
 
-            differences = (np.absolute(times - np.array(self.my_times[int(elem[2])])) + np.absolute(times - np.array(self.their_times[int(elem[2])]))) / 2
-            diffs.append(differences)
+        # one row per sorted reference
+        reference_index = self.sorted_propagation[:,2].astype(int)
+        reference_locations = np.asarray(self.reference_locations, dtype=float)[reference_index]
+        my_times = np.asarray(self.my_times, dtype=self.weight_dtype)[reference_index, None]
+        their_times = np.asarray(self.their_times, dtype=self.weight_dtype)[reference_index, None]
+
+        grid = np.asarray(self.lat_lon_grid, dtype=float).reshape(-1, 2)
+
+        # references x grid points, in chunks of grid points to bound the memory of fine grids
+        diff_sums = np.zeros(len(grid))
+        diff_max = 0.0
+        for start in range(0, len(grid), self.weight_chunk_size):
+            chunk = grid[start:start + self.weight_chunk_size]
+
+            distances = distance_matrix(reference_locations, chunk) * 1000
+            with np.errstate(divide='ignore', invalid='ignore'):
+                times = (distances / prop.get_time(distances)).astype(self.weight_dtype)
+
+            differences = (np.absolute(times - my_times) + np.absolute(times - their_times)) / 2
+            diff_sums[start:start + len(chunk)] = np.sum(differences, axis=0, dtype=float)
+            diff_max = np.maximum(diff_max, np.amax(differences))
 
         try:
-            mean_diffs = np.mean(np.array(diffs) / np.amax(diffs), axis=0)
+            # mean over all references of the differences relative to the overall maximum
+            mean_diffs = diff_sums / (len(reference_index) * diff_max)
             min_mean = np.amin(mean_diffs)
             span_mean = np.amax(mean_diffs) - min_mean
             normalized_diffs = (mean_diffs - min_mean) / span_mean
@@ -159,48 +183,37 @@ class Verifier():
             self.normalized_diffs = [0]
 
     def decide_country(self):
-        country_weights = {x: [] for x in self.countries}
-
         merged_grid = np.array([[x[0], x[1], self.normalized_diffs[idx]] for idx, x in enumerate(self.lat_lon_grid)])
-        sorted_by_weight = merged_grid[merged_grid[:,2].argsort()] #! ascending, do we want that?
+        order = merged_grid[:,2].argsort()
+        sorted_by_weight = merged_grid[order] #! ascending, do we want that?
 
         # median_weight = median(self.normalized_diffs)
         # filtered_grid = [x for x in sorted_by_weight if x[2] >= median_weight] #! do it without
-        
-        # ---------------------------
 
-        # for elem in enumerate(filtered_grid):
-        for elem in enumerate(sorted_by_weight):
-            p = Point(elem[1][1], elem[1][0])
-            weight = elem[1][2]
+        # ---------------------------
+        # country index of every grid point, -1 outside of Europe
+        if self.grid_index is not None:
+            labels = self.shared_grid.labels[self.grid_index[order]]
+        else:
+            labels = europe_classifier().classify(sorted_by_weight[:,:2])
+        on_land = labels >= 0
 
-            for country in self.eu_polygons:
-                if self.eu_polygons[country].contains(p):
-                    country_weights[country].append(weight)
+        num_countries = len(self.countries)
+        counts = np.bincount(labels[on_land], minlength=num_countries)
+        weights = np.bincount(labels[on_land], weights=sorted_by_weight[on_land,2], minlength=num_countries)
         # ---------------------------
 
-        weight_memory = 0
-        filtered_country_weights = {x: country_weights[x] for x in country_weights if len(country_weights[x]) > 0}
-        country_weight_dict = {}
-        for country in filtered_country_weights:
-            try:
-                # w = sum(country_weights[country]) / len(country_weights[country])
-                w = sum(country_weights[country])
-                country_weight_dict[country] = [w]
+        country_weight_dict = {self.countries[idx]: [weights[idx]] for idx in np.flatnonzero(counts > 0)}
 
-                if w > weight_memory:
-                    decision = country
-                    weight_memory = w
-            except:
-                pass
+        # the first country with the highest positive weight
+        if len(weights) == 0 or weights.max() <= 0:
+            raise ValueError('no country with a positive weight')
+        decision = self.countries[int(np.argmax(weights))]
 
         self.filtered_grid = merged_grid
         self.decision = decision
         self.country_weights = country_weight_dict
 
-        self.ctr_results = pd.DataFrame.from_dict(country_weight_dict)
-        self.ctr_results.to_csv('mp/{}_country_weights.csv'.format(self.me.node_id), sep=',', index=False)
-
     def verify_location(self):
         sort_success = self.sort_by_time()
         if sort_success:
@@ -218,12 +231,15 @@ class Verifier():
                         if initial_round:
                             ref_loc = self.reference_locations[reference_index]
 
-                            if ref_loc != self.me.get_location():
+                            if tuple(ref_loc) != tuple(self.me.get_location()):
                             
-                                num_points = floor(distance_limit / self.grid_resolution)
+                                if self.grid_cache is not None:
+                                    self.select_cached_grid(ref_loc, distance_limit)
+                                else:
+                                    num_points = floor(distance_limit / self.grid_resolution)
 
-                                self.compute_lat_grid(ref_loc, num_points)
-                                self.compute_full_grid(num_points)
+                                    self.compute_lat_grid(ref_loc, num_points)
+                                    self.compute_full_grid(num_points)
                                 # self.crop_full_grid(ref_loc, distance_limit, area_memory)
                                 # ! use target as center and not the reference
                                 self.crop_full_grid(self.me.get_location(), distance_limit, area_memory)
@@ -232,7 +248,7 @@ class Verifier():
                         else:
                             # all other rounds
                             new_ref_loc = self.reference_locations[reference_index]
-                            if new_ref_loc != ref_loc:
+                            if tuple(new_ref_loc) != tuple(ref_loc):
                                 try:
                                     self.crop_full_grid(self.me.get_location(), distance_limit, area_memory)
                                 